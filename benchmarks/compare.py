@@ -0,0 +1,48 @@
+# benchmarks/compare.py
+"""Ikki benchmark natijasini solishtiradi; p95 chegaradan ko'p o'ssa 1 kodi bilan chiqadi.
+
+    python -m benchmarks.compare old.json new.json --threshold 0.15
+"""
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> tuple[dict, dict]:
+    with open(path) as f:
+        report = json.load(f)
+    rows = {(row["bench"], row["megapixels"], row["format"]): row for row in report["results"]}
+    return report, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative p95 growth")
+    args = parser.parse_args()
+
+    old_report, old_rows = load(args.baseline)
+    new_report, new_rows = load(args.candidate)
+    print(f"{old_report['commit']} -> {new_report['commit']}")
+    print(f"{'bench':<15} {'MP':>5} {'fmt':<5} {'p50 old':>10} {'p50 new':>10} {'p95 old':>10} {'p95 new':>10} "
+          f"{'Δp95':>7} {'RSS MB':>8}")
+
+    regressions = 0
+    for key in sorted(old_rows.keys() & new_rows.keys()):
+        old, new = old_rows[key], new_rows[key]
+        change = new["p95"] / old["p95"] - 1 if old["p95"] else 0.0
+        flag = ""
+        if change > args.threshold:
+            regressions += 1
+            flag = "  <-- regression"
+        print(f"{key[0]:<15} {key[1]:>5} {key[2]:<5} {old['p50'] * 1000:>8.1f}ms {new['p50'] * 1000:>8.1f}ms "
+              f"{old['p95'] * 1000:>8.1f}ms {new['p95'] * 1000:>8.1f}ms {change:>+7.0%} {new['peak_rss_mb']:>8.0f}{flag}")
+
+    if regressions:
+        print(f"{regressions} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# benchmarks/fake_telegram.py
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter, defaultdict
+from aiohttp import web
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Loadtest", "username": "loadtest_bot"}
+
+
+class FakeTelegram:
+    """Lokal Bot API: getUpdates navbati, fayllar va botning chiquvchi xabarlari.
+
+    Virtual foydalanuvchilar updateni `push_update` bilan qo'yadi va
+    botning shu chatga yuborgan xabarlarini `outbox(chat_id)` navbatidan o'qiydi.
+    """
+
+    def __init__(self):
+        self.updates: list[dict] = []
+        self.files: dict[str, bytes] = {}
+        self.calls = Counter()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._new_updates = asyncio.Event()
+        self._outboxes: dict[int, asyncio.Queue] = defaultdict(asyncio.Queue)
+        self._pushed_at: dict[int, float] = {}
+        # Update yaratilgandan bot uni getUpdates bilan olguncha
+        self.fetch_delays: list[float] = []
+
+    def add_file(self, data: bytes) -> str:
+        file_id = f"file-{next(self._file_ids)}"
+        self.files[file_id] = data
+        return file_id
+
+    def next_message_id(self) -> int:
+        return next(self._message_ids)
+
+    def push_update(self, payload: dict) -> int:
+        update_id = next(self._update_ids)
+        self.updates.append({"update_id": update_id, **payload})
+        self._pushed_at[update_id] = time.perf_counter()
+        self._new_updates.set()
+        return update_id
+
+    def outbox(self, chat_id: int) -> asyncio.Queue:
+        return self._outboxes[chat_id]
+
+    def _message(self, chat_id: int, fields, **extra) -> dict:
+        message = {
+            "message_id": self.next_message_id(),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            **extra,
+        }
+        if fields.get("reply_markup"):
+            message["reply_markup"] = json.loads(fields["reply_markup"])
+        return message
+
+    def _deliver(self, method: str, chat_id: int, message: dict):
+        self._outboxes[chat_id].put_nowait((method, message, time.perf_counter()))
+
+    async def _get_updates(self, fields) -> list[dict]:
+        offset = int(fields.get("offset", 0))
+        limit = int(fields.get("limit", 100))
+        timeout = float(fields.get("timeout", 0))
+        self.updates = [update for update in self.updates if update["update_id"] >= offset]
+        if not self.updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        batch = self.updates[:limit]
+        now = time.perf_counter()
+        for update in batch:
+            pushed_at = self._pushed_at.pop(update["update_id"], None)
+            if pushed_at is not None:
+                self.fetch_delays.append(now - pushed_at)
+        return batch
+
+    @staticmethod
+    def _file_size(upload) -> int:
+        if isinstance(upload, web.FileField):
+            return len(upload.file.read())
+        return 0
+
+    async def call(self, method: str, fields) -> object:
+        chat_id = int(fields.get("chat_id", 0) or 0)
+        if method == "getUpdates":
+            return await self._get_updates(fields)
+        if method == "getMe":
+            return BOT_USER
+        if method == "getFile":
+            file_id = fields["file_id"]
+            if file_id not in self.files:
+                raise LookupError("Bad Request: invalid file_id")
+            return {"file_id": file_id, "file_unique_id": file_id, "file_size": len(self.files[file_id]),
+                    "file_path": f"photos/{file_id}.jpg"}
+        if method == "sendMessage":
+            message = self._message(chat_id, fields, text=fields.get("text", ""))
+        elif method == "sendPhoto":
+            size = self._file_size(fields.get("photo"))
+            file_id = f"out-{self.next_message_id()}"
+            message = self._message(chat_id, fields, caption=fields.get("caption", ""), photo=[
+                {"file_id": file_id, "file_unique_id": file_id, "width": 1, "height": 1, "file_size": size}
+            ])
+        elif method == "sendDocument":
+            size = self._file_size(fields.get("document"))
+            file_id = f"out-{self.next_message_id()}"
+            message = self._message(chat_id, fields, caption=fields.get("caption", ""), document={
+                "file_id": file_id, "file_unique_id": file_id, "file_size": size
+            })
+        elif method == "sendMediaGroup":
+            media = json.loads(fields["media"])
+            messages = [self._message(chat_id, {}, media_group_id="1") for _ in media]
+            for message in messages:
+                self._deliver(method, chat_id, message)
+            return messages
+        elif method in ("editMessageReplyMarkup", "editMessageText"):
+            message = self._message(chat_id, fields, text=fields.get("text", ""))
+            message["message_id"] = int(fields["message_id"])
+        else:
+            # answerCallbackQuery, deleteMessage, deleteWebhook va boshqalar
+            return True
+        self._deliver(method, chat_id, message)
+        return message
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        fields = await request.post()
+        try:
+            result = await self.call(method, fields)
+        except LookupError as e:
+            return web.json_response({"ok": False, "error_code": 400, "description": str(e)}, status=400)
+        return web.json_response({"ok": True, "result": result})
+
+    async def handle_file(self, request: web.Request) -> web.Response:
+        file_id = request.match_info["path"].rsplit("/", 1)[-1].rsplit(".", 1)[0]
+        self.calls["download"] += 1
+        if file_id not in self.files:
+            raise web.HTTPNotFound()
+        return web.Response(body=self.files[file_id], content_type="application/octet-stream")
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=256 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self.handle_method)
+        app.router.add_get("/file/bot{token}/{path:.+}", self.handle_file)
+        return app
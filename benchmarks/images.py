@@ -0,0 +1,52 @@
+# benchmarks/images.py
+import io
+import numpy as np
+from PIL import Image
+
+SIZES_MP = (0.5, 3, 12, 48)
+FORMATS = ("JPEG", "PNG", "WEBP")
+
+
+def dimensions_for(megapixels: float, aspect: float = 4 / 3) -> tuple[int, int]:
+    height = int(round((megapixels * 1_000_000 / aspect) ** 0.5))
+    return int(round(height * aspect)), height
+
+
+def synthetic_image(megapixels: float, seed: int = 0) -> Image.Image:
+    """Gradient, shakllar va past shovqin: fotosuratga yaqin siqilish darajasi uchun"""
+    width, height = dimensions_for(megapixels)
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 1, width, dtype=np.float32)[np.newaxis, :]
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, np.newaxis]
+    rgb = np.empty((height, width, 3), dtype=np.uint8)
+    rgb[..., 0] = (200 * x + 40 * y).astype(np.uint8)
+    rgb[..., 1] = (120 + 80 * np.sin(6 * x + 3 * y)).astype(np.uint8)
+    rgb[..., 2] = (220 * y).astype(np.uint8)
+
+    # Markazdagi "obyekt"
+    mask = ((x - 0.5) ** 2 / 0.06 + (y - 0.55) ** 2 / 0.1) < 1
+    rgb[mask] = (rgb[mask] * 0.4 + np.array([160, 90, 60]) * 0.6).astype(np.uint8)
+
+    noise = rng.integers(-6, 7, size=(height, width, 1), dtype=np.int16)
+    rgb = np.clip(rgb.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    return Image.fromarray(rgb)
+
+
+def encode(image: Image.Image, fmt: str) -> bytes:
+    buffered = io.BytesIO()
+    if fmt == "JPEG":
+        image.save(buffered, format="JPEG", quality=90)
+    elif fmt == "WEBP":
+        image.save(buffered, format="WEBP", quality=90, method=0)
+    else:
+        image.save(buffered, format="PNG", compress_level=1)
+    return buffered.getvalue()
+
+
+def build_inputs(sizes=SIZES_MP, formats=FORMATS) -> dict[tuple[float, str], bytes]:
+    inputs = {}
+    for megapixels in sizes:
+        image = synthetic_image(megapixels)
+        for fmt in formats:
+            inputs[(megapixels, fmt)] = encode(image, fmt)
+    return inputs
@@ -0,0 +1,305 @@
+# benchmarks/run.py
+"""Rasm pipeline uchun oflayn benchmark.
+
+Misol:
+    python -m benchmarks.run --sizes 0.5,3 --formats jpeg,png --iterations 10 --latency 0.3
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+
+OpenRouter o'rniga lokal stub server ishlatiladi, Telegram va Postgres kerak emas.
+"""
+import argparse
+import asyncio
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Optional
+from benchmarks.env import configure_offline_env
+from benchmarks.images import FORMATS, SIZES_MP, build_inputs, dimensions_for
+from benchmarks.stub_openrouter import STUB_PATH, make_canned_result, start_stub_openrouter
+
+BENCHES = ("validate", "prepare_upload", "watermark", "render", "full")
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(latencies: list[float], wall: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "n": len(ordered),
+        "throughput": len(ordered) / wall if wall else 0.0,
+        "mean": sum(ordered) / len(ordered),
+        "min": ordered[0],
+        "p50": percentile(ordered, 0.50),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "max": ordered[-1],
+    }
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux KB da, macOS baytda qaytaradi
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+class RssSampler:
+    """Keys davomida RSS ni fon oqimida o'qiydi: ru_maxrss butun jarayon cho'qqisini
+    beradi va birinchi og'ir keysdan keyin boshqalarini ko'rsatmay qo'yadi"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.start_mb = self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    def __enter__(self):
+        gc.collect()
+        self.start_mb = self.peak_mb = current_rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    def stats(self) -> dict:
+        return {
+            "rss_start_mb": self.start_mb,
+            "peak_rss_mb": self.peak_mb,
+            "rss_growth_mb": self.peak_mb - self.start_mb,
+        }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    # Oldingi snapshotning o'zi farqqa qo'shilmasligi uchun tracemalloc fayllari chiqariladi
+    return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+
+def _allocation_stats(before: tracemalloc.Snapshot) -> dict:
+    diff = _snapshot().compare_to(before, "filename")
+    _, peak = tracemalloc.get_traced_memory()
+    return {
+        # O'tishdan keyin qolgan bloklar va baytlar (o'tishdan oldingi holatga nisbatan)
+        "alloc_blocks_diff": sum(stat.count_diff for stat in diff),
+        "alloc_kb_diff": sum(stat.size_diff for stat in diff) / 1024,
+        "alloc_peak_kb": peak / 1024,
+    }
+
+
+def measure_allocations(run_once) -> dict:
+    """Bitta qo'shimcha o'tish tracemalloc ostida: vaqt o'lchovlariga ta'sir qilmasligi uchun alohida"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = _snapshot()
+        tracemalloc.reset_peak()
+        run_once()
+        return _allocation_stats(before)
+    finally:
+        tracemalloc.stop()
+
+
+async def measure_allocations_async(factory) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = _snapshot()
+        tracemalloc.reset_peak()
+        await factory()
+        return _allocation_stats(before)
+    finally:
+        tracemalloc.stop()
+
+
+def bench_sync(func, iterations: int, warmup: int) -> dict:
+    with RssSampler() as rss:
+        for _ in range(warmup):
+            func()
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(iterations):
+            begin = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - begin)
+        wall = time.perf_counter() - started
+    result = summarize(latencies, wall)
+    result.update(rss.stats())
+    result.update(measure_allocations(func))
+    return result
+
+
+async def bench_async(factory, iterations: int, warmup: int, concurrency: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            begin = time.perf_counter()
+            await factory()
+            latencies.append(time.perf_counter() - begin)
+
+    with RssSampler() as rss:
+        for _ in range(warmup):
+            await factory()
+        started = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(iterations)])
+        wall = time.perf_counter() - started
+    result = summarize(latencies, wall)
+    result.update(rss.stats())
+    result.update(await measure_allocations_async(factory))
+    return result
+
+
+async def run(args) -> dict:
+    # Loyiha modullari muhit o'zgaruvchilari o'rnatilgandan keyin import qilinadi
+    from PIL import Image
+    from photos.pipeline import prepare_upload, probe_image, render_outputs
+    from photos.watermark import watermark_renderer
+    from handlers.photo_handler import process_image_with_retry
+    from services.backends import close_backends
+    from services.cpu_pool import cpu_pool
+    from config import settings
+
+    sizes = [float(value) for value in args.sizes.split(",")]
+    formats = [value.strip().upper() for value in args.formats.split(",")]
+    benches = [value.strip() for value in args.benches.split(",")]
+
+    print(f"Generating inputs: {sizes} MP x {formats}", file=sys.stderr)
+    inputs = build_inputs(sizes, formats)
+    canned = make_canned_result((1024, 1024))
+    stub = await start_stub_openrouter("127.0.0.1", args.port, latency=args.latency, jitter=args.jitter,
+                                       result_png=canned)
+
+    results = []
+    try:
+        for (megapixels, fmt), image_bytes in inputs.items():
+            info = probe_image(image_bytes)
+            size = info.size
+            clean = Image.open(io.BytesIO(canned)).convert("RGBA").resize(size)
+            cases = {
+                "validate": lambda: probe_image(image_bytes),
+                "prepare_upload": lambda: prepare_upload(
+                    image_bytes, settings.upload_max_side, settings.upload_format, settings.upload_quality
+                ),
+                "watermark": lambda: watermark_renderer.apply(clean),
+                "render": lambda: render_outputs(canned, size),
+            }
+            for bench in benches:
+                print(f"  {bench:<15} {megapixels:>5} MP {fmt:<5}", file=sys.stderr, end="", flush=True)
+                if bench == "full":
+                    stats = await bench_async(
+                        lambda: process_image_with_retry(image_bytes, size, retries=1),
+                        args.iterations, args.warmup, args.concurrency,
+                    )
+                else:
+                    stats = bench_sync(cases[bench], args.iterations, args.warmup)
+                if bench == "render":
+                    clean_bytes, preview_bytes = render_outputs(canned, size)
+                    stats.update({"clean_bytes": len(clean_bytes), "preview_bytes": len(preview_bytes)})
+                stats.update({
+                    "bench": bench,
+                    "megapixels": megapixels,
+                    "format": fmt,
+                    "dimensions": list(dimensions_for(megapixels)),
+                    "input_bytes": len(image_bytes),
+                })
+                results.append(stats)
+                print(f"  p50 {stats['p50'] * 1000:9.1f} ms  p95 {stats['p95'] * 1000:9.1f} ms  "
+                      f"{stats['throughput']:7.2f}/s", file=sys.stderr)
+            del clean
+    finally:
+        await close_backends()
+        cpu_pool.shutdown()
+        await stub.cleanup()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "cpu_pool_mode": settings.cpu_pool_mode,
+            "upload_max_side": settings.upload_max_side,
+            "upload_format": settings.upload_format,
+            "preview_format": settings.preview_format,
+            "preview_max_side": settings.preview_max_side,
+            "autocrop_enabled": settings.autocrop_enabled,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline image pipeline benchmark")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in SIZES_MP), help="megapixels, comma-separated")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="JPEG, PNG, WEBP")
+    parser.add_argument("--benches", default=",".join(BENCHES), help=f"subset of {', '.join(BENCHES)}")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=1, help="parallel requests in the full bench")
+    parser.add_argument("--latency", type=float, default=0.0, help="stub OpenRouter latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="stub latency jitter, seconds")
+    parser.add_argument("--port", type=int, default=18765)
+    parser.add_argument("--cpu-pool-mode", default="thread", choices=("thread", "process"))
+    parser.add_argument("--output", help="JSON path (default: benchmarks/results/<time>-<commit>.json)")
+    args = parser.parse_args()
+
+    configure_offline_env(
+        openrouter_url=f"http://127.0.0.1:{args.port}{STUB_PATH}",
+        bg_backend="openrouter",
+        result_cache_enabled="false",
+        cpu_pool_mode=args.cpu_pool_mode,
+    )
+    report = asyncio.run(run(args))
+
+    output = args.output or os.path.join(
+        "benchmarks", "results",
+        f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{report['commit']}.json",
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# benchmarks/stub_openrouter.py
+import asyncio
+import base64
+import io
+import random
+from aiohttp import web
+from PIL import Image, ImageDraw
+
+STUB_PATH = "/api/v1/chat/completions"
+
+
+def make_canned_result(size: tuple[int, int] = (1024, 1024)) -> bytes:
+    """Foni olib tashlangan natijaga o'xshash RGBA PNG: shaffof fon va markazdagi obyekt"""
+    image = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    draw.ellipse((width // 6, height // 8, width * 5 // 6, height * 7 // 8), fill=(180, 120, 90, 255))
+    draw.rectangle((width // 3, height // 3, width * 2 // 3, height * 2 // 3), fill=(40, 90, 160, 255))
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def create_stub_openrouter_app(latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                               result_png: bytes = None) -> web.Application:
+    """OpenRouter chat/completions javobini taqlid qiladi: kechikish, tebranish va xato ulushi sozlanadi"""
+    data_url = "data:image/png;base64," + base64.b64encode(result_png or make_canned_result()).decode()
+    body = {"choices": [{"message": {"role": "assistant", "content": "", "images": [
+        {"type": "image_url", "image_url": {"url": data_url}}
+    ]}}]}
+
+    async def handle(request: web.Request) -> web.Response:
+        await request.read()
+        delay = max(0.0, latency + random.uniform(-jitter, jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        if error_rate and random.random() < error_rate:
+            return web.json_response({"error": {"message": "stub failure"}}, status=502)
+        request.app["requests"] += 1
+        return web.json_response(body)
+
+    app = web.Application(client_max_size=256 * 1024 * 1024)
+    app["requests"] = 0
+    app.router.add_post(STUB_PATH, handle)
+    return app
+
+
+async def start_stub_openrouter(host: str, port: int, **options) -> web.AppRunner:
+    runner = web.AppRunner(create_stub_openrouter_app(**options))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
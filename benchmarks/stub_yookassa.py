@@ -0,0 +1,88 @@
+# benchmarks/stub_yookassa.py
+import asyncio
+import itertools
+import json
+import random
+from datetime import datetime, timezone
+from aiohttp import web
+
+CHECKOUT_PATH = "/checkout/"
+
+
+class StubYooKassa:
+    """YooKassa v3 API ning bot ishlatadigan qismi: to'lov yaratish, o'qish va ro'yxat.
+
+    To'lov `pay(payment_id)` yoki confirmation_url ga POST qilinganda
+    succeeded holatiga o'tadi.
+    """
+
+    def __init__(self, base_url: str, latency: float = 0.0, jitter: float = 0.0):
+        self.base_url = base_url.rstrip("/")
+        self.latency = latency
+        self.jitter = jitter
+        self.payments: dict[str, dict] = {}
+        self._ids = itertools.count(1)
+
+    async def _delay(self):
+        delay = max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+        if delay:
+            await asyncio.sleep(delay)
+
+    def pay(self, payment_id: str) -> bool:
+        payment = self.payments.get(payment_id)
+        if payment is None or payment["status"] != "pending":
+            return False
+        payment["status"] = "succeeded"
+        payment["paid"] = True
+        return True
+
+    async def handle_create(self, request: web.Request) -> web.Response:
+        body = json.loads(await request.read())
+        await self._delay()
+        payment_id = f"stub-{next(self._ids):08d}"
+        payment = {
+            "id": payment_id,
+            "status": "pending",
+            "paid": False,
+            "amount": body["amount"],
+            "description": body.get("description", ""),
+            "metadata": body.get("metadata", {}),
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+            "confirmation": {"type": "redirect",
+                             "confirmation_url": f"{self.base_url}{CHECKOUT_PATH}{payment_id}"},
+        }
+        self.payments[payment_id] = payment
+        return web.json_response(payment)
+
+    async def handle_get(self, request: web.Request) -> web.Response:
+        await self._delay()
+        payment = self.payments.get(request.match_info["payment_id"])
+        if payment is None:
+            return web.json_response({"type": "error", "code": "not_found"}, status=404)
+        return web.json_response(payment)
+
+    async def handle_list(self, request: web.Request) -> web.Response:
+        await self._delay()
+        status = request.query.get("status")
+        since = request.query.get("created_at.gte", "")
+        limit = int(request.query.get("limit", 100))
+        start = int(request.query.get("cursor", 0))
+        # ISO vaqtlar bir xil formatda, shuning uchun satr sifatida solishtiriladi
+        items = [payment for payment in self.payments.values()
+                 if (not status or payment["status"] == status) and payment["created_at"] >= since]
+        page = items[start:start + limit]
+        body = {"type": "list", "items": page}
+        if start + limit < len(items):
+            body["next_cursor"] = str(start + limit)
+        return web.json_response(body)
+
+    async def handle_checkout(self, request: web.Request) -> web.Response:
+        return web.json_response({"paid": self.pay(request.match_info["payment_id"])})
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v3/payments", self.handle_create)
+        app.router.add_get("/v3/payments", self.handle_list)
+        app.router.add_get("/v3/payments/{payment_id}", self.handle_get)
+        app.router.add_post(CHECKOUT_PATH + "{payment_id}", self.handle_checkout)
+        return app
@@ -17,8 +17,124 @@ class Settings(BaseSettings):
     support_username: str = "@support"
     database_url: str
     log_level: str = "INFO"
+    metrics_enabled: bool = False
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 9100
+    metrics_path: str = "/metrics"
+    user_cache_size: int = 10000
+    fsm_ttl_hours: int = 72
+
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 10.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 200
+    db_prepared_statement_cache_size: int = 200
     admin_ids: List[int] = [] 
 
+    openrouter_url: str = "https://openrouter.ai/api/v1/chat/completions"
+    openrouter_model: str = "google/gemini-2.5-flash-preview-image"
+    openrouter_pool_size: int = 20
+    openrouter_keepalive: float = 30.0
+    openrouter_timeout: float = 60.0
+    openrouter_connect_timeout: float = 10.0
+    openrouter_download_timeout: float = 30.0
+
+    bg_backend: str = "openrouter"
+    bg_providers: str = "openrouter"
+    router_window: int = 50
+    router_breaker_error_rate: float = 0.5
+    router_breaker_min_requests: int = 5
+    router_breaker_cooldown: float = 30.0
+    router_hedge_enabled: bool = False
+    router_hedge_percentile: float = 0.9
+    router_hedge_min_delay: float = 2.0
+    router_hedge_max_delay: float = 20.0
+    onnx_model_path: str = ""
+    onnx_model_url: str = "https://github.com/danielgatis/rembg/releases/download/v0.0.0/u2net.onnx"
+    # Standart URL dagi u2net.onnx xeshi (rembg bilan bir xil); URL almashtirilsa, xesh ham almashtiriladi
+    onnx_model_hash: str = "md5:60024c5c889badc19c04ad937298a77b"
+    onnx_model_dir: str = "models"
+    onnx_input_size: int = 320
+    onnx_pool_size: int = 2
+    onnx_intra_op_threads: int = 2
+    onnx_inter_op_threads: int = 1
+
+    result_cache_enabled: bool = True
+    result_cache_dir: str = "cache/results"
+    result_cache_max_mb: int = 1024
+    result_cache_ttl_hours: int = 72
+
+    cpu_pool_mode: str = "process"
+    cpu_pool_workers: int = 0
+    cpu_pool_queue_size: int = 32
+
+    watermark_overlay_cache_size: int = 8
+
+    upload_max_side: int = 1536
+    upload_format: str = "JPEG"
+    upload_quality: int = 90
+
+    # Preview chatda ko'rish uchun: kichraytirilgan va yo'qotishli formatda
+    preview_format: str = "WEBP"
+    preview_max_side: int = 1280
+    preview_quality: int = 80
+    # WebP kodlash sarfi 0-6: 2 dan yuqorisi bir necha foiz uchun ancha sekin
+    preview_webp_method: int = 2
+    # To'langan fayl: zlib darajasi 0-9, optimize sekinroq lekin kichikroq
+    clean_png_compress_level: int = 6
+    clean_png_optimize: bool = False
+    autocrop_enabled: bool = False
+    autocrop_margin: int = 8
+    # To'lovgacha original + alfa mask saqlanadi, toza PNG to'lov paytida yig'iladi
+    mask_storage_enabled: bool = True
+    mask_max_color_diff: float = 12.0
+
+    invoice_ttl_minutes: int = 10
+    payment_poll_min_interval: float = 3.0
+    payment_poll_max_interval: float = 30.0
+    payment_poll_backoff: float = 1.5
+    payment_poll_webhook_interval: float = 60.0
+
+    yookassa_api_url: str = "https://api.yookassa.ru/v3"
+    yookassa_pool_size: int = 10
+    yookassa_timeout: float = 15.0
+    yookassa_connect_timeout: float = 5.0
+    yookassa_max_attempts: int = 3
+    yookassa_backoff_base: float = 0.5
+
+    # Bo'sh bo'lmasa Bot API so'rovlari shu manzilga yuboriladi (lokal Bot API server yoki yuklama testi)
+    telegram_api_base: str = ""
+    telegram_webhook_enabled: bool = False
+    telegram_webhook_url: str = ""
+    telegram_webhook_host: str = "0.0.0.0"
+    telegram_webhook_port: int = 8080
+    telegram_webhook_path: str = "/telegram/webhook"
+    telegram_webhook_secret: str = ""
+    telegram_webhook_max_connections: int = 40
+    telegram_webhook_workers: int = 1
+    telegram_webhook_worker_base_port: int = 8090
+
+    yookassa_webhook_enabled: bool = False
+    yookassa_webhook_host: str = "0.0.0.0"
+    yookassa_webhook_port: int = 8081
+    yookassa_webhook_path: str = "/yookassa/webhook"
+    yookassa_webhook_verify: bool = True
+    yookassa_webhook_trusted_ips: str = (
+        "185.71.76.0/27,185.71.77.0/27,77.75.153.0/25,77.75.156.11,"
+        "77.75.156.35,77.75.154.128/25,2a02:5180::/32"
+    )
+    blob_memory_mb: int = 256
+    blob_spill_dir: str = "cache/blobs"
+    blob_ttl_minutes: int = 60
+
+    scheduler_max_concurrency: int = 8
+    scheduler_per_user_limit: int = 2
+
+    album_latency: float = 0.6
+    album_max_items: int = 10
+
     class Config:
         env_file = ".env"
         extra = "ignore"
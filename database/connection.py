@@ -1,18 +1,58 @@
 # database/connection.py
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from config import settings
 from utils.logger import logger
+from utils.metrics import STAGE_SECONDS
 
-engine = create_async_engine(settings.database_url.replace("postgresql://", "postgresql+asyncpg://"), echo=False)
+database_url = make_url(settings.database_url.replace("postgresql://", "postgresql+asyncpg://"))
+if database_url.drivername == "postgresql+asyncpg":
+    # SQLAlchemy darajasidagi prepared statement keshi
+    database_url = database_url.update_query_dict(
+        {"prepared_statement_cache_size": str(settings.db_prepared_statement_cache_size)}
+    )
+
+engine = create_async_engine(
+    database_url,
+    echo=False,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    connect_args={"statement_cache_size": settings.db_statement_cache_size},
+)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    STAGE_SECONDS.observe(time.perf_counter() - context._query_started, stage="db_query")
+
+
 async def get_async_session() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
 
+def get_pool_stats() -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
 async def init_db():
     async with engine.begin() as conn:
         from .models import Base
         await conn.run_sync(Base.metadata.create_all)
-    logger.info("Database tables created/verified")
\ No newline at end of file
+    logger.info("Database tables created/verified")
@@ -0,0 +1,136 @@
+# database/fsm_storage.py
+import asyncio
+import json
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Mapping, Optional
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from config import settings
+from database.connection import AsyncSessionLocal
+from database.models import FsmRecord
+from utils.logger import logger
+
+
+def pack_data(data: Mapping[str, Any]) -> Optional[bytes]:
+    if not data:
+        return None
+    return zlib.compress(json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+
+def unpack_data(raw: Optional[bytes]) -> Dict[str, Any]:
+    if not raw:
+        return {}
+    return json.loads(zlib.decompress(raw).decode("utf-8"))
+
+
+class PostgresStorage(BaseStorage):
+    """Postgres ustidagi FSM storage: bir nechta bot jarayoni bitta holatni ulashadi.
+
+    Har bir kalit bitta qator: state, zlib+JSON ko'rinishidagi data va
+    har yozuvda yangilanadigan expires_at. Rasm baytlari bu yerda saqlanmaydi,
+    ular blob_store da turadi.
+    """
+
+    def __init__(self, ttl: int, key_builder: Optional[KeyBuilder] = None, session_factory=AsyncSessionLocal):
+        self.ttl = ttl
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.session_factory = session_factory
+
+    def _expires_at(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.ttl)
+
+    def _upsert(self, storage_key: str, **values):
+        now = datetime.utcnow()
+        stmt = insert(FsmRecord).values(key=storage_key, expires_at=self._expires_at(), **values)
+        set_ = {"expires_at": stmt.excluded.expires_at}
+        for column in ("state", "data"):
+            if column in values:
+                set_[column] = getattr(stmt.excluded, column)
+            else:
+                # Muddati o'tgan qatorning qolgan ustuni yangi yozuvga o'tmasligi kerak
+                set_[column] = case((FsmRecord.expires_at <= now, None), else_=getattr(FsmRecord, column))
+        return stmt.on_conflict_do_update(index_elements=[FsmRecord.key], set_=set_)
+
+    async def _select(self, session, storage_key: str, column):
+        stmt = select(column).where(FsmRecord.key == storage_key, FsmRecord.expires_at > datetime.utcnow())
+        result = await session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        async with self.session_factory() as session:
+            await session.execute(self._upsert(self.key_builder.build(key), state=state))
+            await session.commit()
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        async with self.session_factory() as session:
+            return await self._select(session, self.key_builder.build(key), FsmRecord.state)
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        async with self.session_factory() as session:
+            await session.execute(self._upsert(self.key_builder.build(key), data=pack_data(data)))
+            await session.commit()
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        async with self.session_factory() as session:
+            return unpack_data(await self._select(session, self.key_builder.build(key), FsmRecord.data))
+
+    async def modify_data(self, key: StorageKey, mutate: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        """Joriy datani qulf ostida qayta o'qib, `mutate` bilan joyida o'zgartiradi va yozadi"""
+        storage_key = self.key_builder.build(key)
+        async with self.session_factory() as session:
+            # Boshqa jarayonlar bilan o'qish-yozishni ketma-ket qilish (tranzaksiya oxirida qo'yib yuboriladi)
+            await session.execute(select(func.pg_advisory_xact_lock(func.hashtext(storage_key))))
+            current = unpack_data(await self._select(session, storage_key, FsmRecord.data))
+            mutate(current)
+            await session.execute(self._upsert(storage_key, data=pack_data(current)))
+            await session.commit()
+        return current.copy()
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> Dict[str, Any]:
+        return await self.modify_data(key, lambda current: current.update(data))
+
+    async def purge_expired(self) -> int:
+        async with self.session_factory() as session:
+            result = await session.execute(delete(FsmRecord).where(FsmRecord.expires_at <= datetime.utcnow()))
+            await session.commit()
+        if result.rowcount:
+            logger.info(f"Purged {result.rowcount} expired FSM records")
+        return result.rowcount
+
+    async def run_cleanup(self, interval: int = 600):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.purge_expired()
+            except Exception as e:
+                logger.error(f"FSM storage cleanup error: {e}")
+
+    async def close(self) -> None:
+        pass
+
+
+async def update_image(state: FSMContext, image_key: str, **fields) -> Dict[str, Any]:
+    """data["images"][image_key] maydonlarini atomar yangilaydi va yangi images lug'atini qaytaradi.
+
+    Butun images lug'atini get_data/update_data bilan qayta yozish bir vaqtdagi
+    boshqa natijani o'chirib yuboradi, shuning uchun yozuv qulf ostida birlashtiriladi.
+    """
+    def mutate(data: Dict[str, Any]):
+        data.setdefault("images", {}).setdefault(image_key, {}).update(fields)
+
+    if isinstance(state.storage, PostgresStorage):
+        data = await state.storage.modify_data(state.key, mutate)
+    else:
+        # MemoryStorage: o'qish va yozish orasida await yo'q
+        data = await state.get_data()
+        mutate(data)
+        await state.set_data(data)
+    return data["images"]
+
+
+fsm_storage = PostgresStorage(ttl=settings.fsm_ttl_hours * 3600)
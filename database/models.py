@@ -1,5 +1,5 @@
 # database/models.py
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, BigInteger
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, Date, ForeignKey, BigInteger, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -13,7 +13,7 @@ class User(Base):
     username = Column(String, nullable=True)
     first_name = Column(String, nullable=True)
     has_free_used = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     payments = relationship("Payment", back_populates="user")
 
@@ -26,5 +26,28 @@ class Payment(Base):
     amount = Column(Integer)
     status = Column(String, default="pending")
     created_at = Column(DateTime, default=datetime.utcnow)
+    # succeeded holatiga o'tgan vaqt: daily_stats dagi paid/revenue shu kun bo'yicha
+    paid_at = Column(DateTime, nullable=True)
+
+    user = relationship("User", back_populates="payments")
+
+    __table_args__ = (
+        Index("ix_payments_user_id_status", "user_id", "status"),
+    )
+
+class DailyStats(Base):
+    __tablename__ = "daily_stats"
+
+    day = Column(Date, primary_key=True)
+    new_users = Column(Integer, nullable=False, default=0)
+    invoices = Column(Integer, nullable=False, default=0)
+    paid = Column(Integer, nullable=False, default=0)
+    revenue = Column(BigInteger, nullable=False, default=0)
+
+class FsmRecord(Base):
+    __tablename__ = "fsm_storage"
 
-    user = relationship("User", back_populates="payments")
\ No newline at end of file
+    key = Column(String, primary_key=True)
+    state = Column(String, nullable=True)
+    data = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
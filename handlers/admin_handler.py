@@ -1,22 +1,41 @@
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message
-from database.connection import get_async_session
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.connection import get_pool_stats
 from repositories.user_repository import UserRepository
+from repositories.stats_repository import StatsRepository
+from services.result_cache import result_cache
+from services.job_scheduler import job_scheduler
+from services.backends import get_backend
 from config import settings
 from utils.logger import logger
 
 router = Router()
 
 @router.message(Command("admin"))
-async def admin_handler(message: Message):
+async def admin_handler(message: Message, session: AsyncSession):
     if message.from_user.id not in settings.admin_ids:
         await message.answer("Доступ запрещен.")
         return
 
-    async for session in get_async_session():
-        user_repo = UserRepository(session)
-        stats = await user_repo.get_stats()
+    user_repo = UserRepository(session)
+    stats = await user_repo.get_stats()
+    daily = await StatsRepository(session).get_range(7)
+
+    trend_lines = "\n".join(
+        f"• {row.day:%d.%m}: +{row.new_users} польз., {row.invoices} счетов, "
+        f"{row.paid} оплат, {row.revenue}₽"
+        for row in daily
+    ) or "• Нет данных"
+    cache_stats = result_cache.stats()
+    pool_stats = get_pool_stats()
+    backend = get_backend()
+    provider_lines = "\n".join(
+        f"• {row['name']}: {row['state']}, ошибки {row['error_rate']:.0%}, "
+        f"p50 {row['p50'] or 0:.1f}с, p95 {row['p95'] or 0:.1f}с"
+        for row in backend.snapshot()
+    ) if hasattr(backend, "snapshot") else f"• {backend.name}"
 
     stats_text = f"""
 📊 Статистика бота:
@@ -24,6 +43,30 @@ async def admin_handler(message: Message):
 • Новых пользователей сегодня: {stats['new_today']}
 • Новых пользователей вчера: {stats['new_yesterday']}
 • Всего пользователей: {stats['total']}
+
+📈 За 7 дней:
+
+{trend_lines}
+
+🗂 Кэш результатов:
+
+• Попаданий: {cache_stats['hits']} ({cache_stats['hit_rate']:.0%})
+• Промахов: {cache_stats['misses']}
+• Записей: {cache_stats['entries']} ({cache_stats['bytes'] // (1024 * 1024)} МБ)
+
+⚙️ Очередь обработки:
+
+• В работе: {job_scheduler.running}
+• В очереди: {job_scheduler.queue_depth}
+
+🔀 Провайдеры:
+
+{provider_lines}
+
+🗄 Пул соединений БД:
+
+• Занято: {pool_stats['checked_out']} / {pool_stats['size']} (+{max(pool_stats['overflow'], 0)} сверх лимита)
+• Свободно: {pool_stats['checked_in']}
     """
     await message.answer(stats_text)
     logger.info(f"Admin stats requested by {message.from_user.id}")
\ No newline at end of file
@@ -1,21 +1,135 @@
 from aiogram import Router, F
-from aiogram.types import CallbackQuery, FSInputFile, InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.types import CallbackQuery, BufferedInputFile, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaDocument
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from database.fsm_storage import fsm_storage, update_image
 from services.payment_service import PaymentService
-from services.image_service import ImageService
-from keyboards.inline_keyboards import get_payment_keyboard, get_paid_keyboard, get_result_keyboard
-from utils.file_utils import save_temp_bytes, cleanup_file
 from database.connection import get_async_session
+from repositories.payment_repository import PaymentRepository
+from services.blob_store import blob_store
+from services.payment_poller import payment_poller
+from services.job_scheduler import PRIORITY_HIGH, job_scheduler
+from services.cpu_pool import cpu_pool
+from photos.pipeline import preview_filename, rebuild_clean, rebuild_preview
+from keyboards.inline_keyboards import get_payment_keyboard, get_paid_keyboard, get_result_keyboard
+from sqlalchemy.ext.asyncio import AsyncSession
 from config import settings
 from utils.logger import logger
+from utils.metrics import FAILURES, PAYMENT_EVENTS, STAGE_SECONDS
 import asyncio
+import time
 from datetime import datetime, timedelta
+from functools import partial
+from typing import Optional
 
 router = Router()
+# Shu jarayonda yetkazilayotgan invoicelar: poller va webhook bir vaqtda kelsa ikki marta yuborilmaydi
+_delivering: set[str] = set()
+
+
+def user_state(bot, telegram_id: int) -> FSMContext:
+    """Handler tashqarisida (webhook, startup) foydalanuvchining shaxsiy chatdagi FSM holati"""
+    return FSMContext(storage=fsm_storage, key=StorageKey(bot_id=bot.id, chat_id=telegram_id, user_id=telegram_id))
+
+
+async def find_invoice_image(state: FSMContext, invoice_id: str) -> Optional[tuple[str, dict]]:
+    data = await state.get_data()
+    for image_key, img_data in data.get("images", {}).items():
+        if img_data.get('invoice_id') == invoice_id:
+            return image_key, img_data
+    return None
+
+
+def register_invoice(bot, state: FSMContext, telegram_id: int, invoice_id: str, image_key: str,
+                     payment_message_id: Optional[int], result_message_id: Optional[int],
+                     created_at: Optional[datetime] = None):
+    payment_poller.register(
+        invoice_id,
+        on_paid=partial(
+            deliver_payment,
+            telegram_id=telegram_id,
+            invoice_id=invoice_id,
+            state=state,
+            bot=bot,
+            payment_message_id=payment_message_id,
+            image_key=image_key
+        ),
+        on_expired=partial(
+            expire_invoice,
+            telegram_id=telegram_id,
+            invoice_id=invoice_id,
+            state=state,
+            bot=bot,
+            payment_message_id=payment_message_id,
+            image_key=image_key,
+            result_message_id=result_message_id
+        ),
+        created_at=created_at
+    )
+
+
+async def restore_pending_invoices(bot, shard: int = 0, shards: int = 1):
+    """Restartdan keyin ochiq invoicelar payments jadvali va FSM bo'yicha pollerga qayta qo'shiladi.
+
+    Bloblar invoice_ttl + blob_ttl davomida saqlanadi, undan eskilarini yetkazib bo'lmaydi.
+    """
+    since = datetime.utcnow() - timedelta(minutes=settings.invoice_ttl_minutes + settings.blob_ttl_minutes)
+    async for session in get_async_session():
+        rows = await PaymentRepository(session).list_pending(since)
+
+    restored = 0
+    for invoice_id, telegram_id, created_at in rows:
+        # Front rejimida har bir worker faqat o'z foydalanuvchilarini oladi
+        if telegram_id % shards != shard:
+            continue
+        state = user_state(bot, telegram_id)
+        found = await find_invoice_image(state, invoice_id)
+        if found is None or found[1].get('paid'):
+            continue
+        image_key, img_data = found
+        register_invoice(bot, state, telegram_id, invoice_id, image_key,
+                         img_data.get('payment_msg_id'), img_data.get('result_msg_id'), created_at)
+        restored += 1
+    if restored:
+        logger.info(f"Restored {restored} pending invoice(s) into the payment poller")
+
+
+async def notify_support(bot, text: str):
+    for admin_id in settings.admin_ids:
+        try:
+            await bot.send_message(admin_id, text)
+        except Exception as e:
+            logger.error(f"Failed to notify admin {admin_id}: {e}")
+
+
+def stored_keys(img_data: dict) -> list[str]:
+    """Rasm uchun blob_store dagi barcha kalitlar: natijalar va mask uchun kerakli originallar"""
+    return img_data.get('result_keys', []) + [key for key in img_data.get('original_keys', []) if key]
+
+
+async def load_stored(img_data: dict) -> Optional[list[tuple[Optional[bytes], bytes]]]:
+    """(original, saqlangan natija) juftliklari; biror blob yo'qolgan bo'lsa None"""
+    result_keys = img_data.get('result_keys', [])
+    original_keys = img_data.get('original_keys') or [None] * len(result_keys)
+    pairs = []
+    for result_key, original_key in zip(result_keys, original_keys):
+        stored_bytes = await blob_store.get(result_key)
+        original_bytes = await blob_store.get(original_key) if original_key else None
+        if stored_bytes is None or (original_key and original_bytes is None):
+            return None
+        pairs.append((original_bytes, stored_bytes))
+    return pairs
+
+
+async def rebuild(telegram_id: int, func, original_bytes: Optional[bytes], stored_bytes: bytes) -> bytes:
+    # To'lagan foydalanuvchi yangi rasmlar navbatida kutmasligi uchun yuqori prioritet
+    return await job_scheduler.run(
+        telegram_id, partial(cpu_pool.run, func, original_bytes, stored_bytes), priority=PRIORITY_HIGH
+    )
 
 
-@router.callback_query(F.data.startswith("pay_"))
-async def payment_handler(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(F.data.startswith("pay_") & ~F.data.startswith("pay_processing_"))
+async def payment_handler(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     try:
         parts = callback.data.split("_", 2) 
         if len(parts) < 3:
@@ -30,6 +144,12 @@ async def payment_handler(callback: CallbackQuery, state: FSMContext):
             await callback.answer("❌ Изображение не найдено или уже оплачено! Сначала отправьте фотографию.", show_alert=True)
             return
 
+        result_keys = images[image_key].get('result_keys', [])
+        blob_keys = stored_keys(images[image_key])
+        if not result_keys or not all([await blob_store.exists(blob_key) for blob_key in blob_keys]):
+            await callback.answer("⏰ Срок хранения изображения истёк. Пожалуйста, отправьте фотографию заново.", show_alert=True)
+            return
+
         logger.info(f"Payment button clicked: user {user_id}, key {image_key}, images keys: {list(images.keys())}")
 
         processing_markup = InlineKeyboardMarkup(inline_keyboard=[
@@ -40,143 +160,237 @@ async def payment_handler(callback: CallbackQuery, state: FSMContext):
 
         await state.update_data(selected_image_key=image_key)
 
-        async for session in get_async_session():
-            invoice_url, invoice_id = await PaymentService.create_invoice(session, user_id)
-
-        # Invoice yaratilgan vaqtni saqlash
-        invoice_created_at = datetime.now()
-        images[image_key]['invoice_id'] = invoice_id
-        images[image_key]['invoice_created_at'] = invoice_created_at
-        await state.update_data(images=images)
+        invoice_url, invoice_id = await PaymentService.create_invoice(
+            session, user_id, amount=settings.price * len(result_keys)
+        )
+        PAYMENT_EVENTS.inc(event="invoice_created")
 
+        # Invoice yaratilgan vaqtni saqlash (FSM data JSON bo'lgani uchun epoch sekundlarda)
+        invoice_created_at = time.time()
+        # Rasm kamida invoice amal qilguncha saqlanadi
+        for blob_key in blob_keys:
+            await blob_store.touch(blob_key, (settings.invoice_ttl_minutes + settings.blob_ttl_minutes) * 60)
         markup = get_payment_keyboard(invoice_url)
         msg = await callback.message.answer("💳 Перейдите по ссылке для оплаты:", reply_markup=markup)
         await callback.answer()
 
-        asyncio.create_task(
-            poll_for_payment(
-                telegram_id=user_id,
-                invoice_id=invoice_id,
-                state=state,
-                bot=callback.bot,
-                payment_message_id=msg.message_id,
-                image_key=image_key,
-                result_message_id=callback.message.message_id,
-                invoice_created_at=invoice_created_at
-            )
+        await update_image(
+            state, image_key,
+            invoice_id=invoice_id,
+            invoice_created_at=invoice_created_at,
+            payment_msg_id=msg.message_id,
         )
 
+        register_invoice(callback.bot, state, user_id, invoice_id, image_key, msg.message_id, callback.message.message_id)
+
     except Exception as e:
         logger.error(f"Payment handler error: {e}")
+        FAILURES.inc(stage="create_invoice", error=type(e).__name__)
         await callback.answer("Ошибка создания платежа. Попробуйте позже.", show_alert=True)
         markup = get_result_keyboard(user_id, image_key)
         await callback.message.edit_reply_markup(reply_markup=markup)
 
 
-async def poll_for_payment(
-    telegram_id: int, 
-    invoice_id: str, 
-    state: FSMContext, 
-    bot, 
-    payment_message_id: int, 
-    image_key: str,
-    result_message_id: int,
-    invoice_created_at: datetime
+async def send_clean_images(bot, telegram_id: int, clean_images: list[bytes]):
+    if len(clean_images) == 1:
+        await bot.send_document(
+            telegram_id,
+            document=BufferedInputFile(clean_images[0], filename="photo_clean.png"),
+            caption="✅ Спасибо за оплату! Вот ваша фотография без водяных знаков 🙌"
+        )
+        return
+
+    media = [
+        InputMediaDocument(media=BufferedInputFile(clean_bytes, filename=f"photo_clean_{index + 1}.png"))
+        for index, clean_bytes in enumerate(clean_images)
+    ]
+    media[-1].caption = "✅ Спасибо за оплату! Вот ваши фотографии без водяных знаков 🙌"
+    # Telegram bitta media groupda ko'pi bilan 10 ta fayl qabul qiladi
+    for start in range(0, len(media), 10):
+        await bot.send_media_group(telegram_id, media=media[start:start + 10])
+
+
+async def deliver_payment(
+    telegram_id: int,
+    invoice_id: str,
+    state: FSMContext,
+    bot,
+    payment_message_id: Optional[int],
+    image_key: str
 ):
-    max_wait_time = timedelta(minutes=10)
-    check_interval = 10  # sekundda
-    max_checks = int(max_wait_time.total_seconds() / check_interval)
-    
-    for check_count in range(max_checks):
-        await asyncio.sleep(check_interval)
-        
-        # Invoice hali aktiv ekanligini tekshirish
-        elapsed_time = datetime.now() - invoice_created_at
-        if elapsed_time >= max_wait_time:
-            logger.info(f"Invoice {invoice_id} expired after 10 minutes")
-            break
-        
-        async for session in get_async_session():
-            payment_status = await PaymentService.check_status(session, invoice_id)
-            
-            if payment_status:
-                try:
-                    await bot.edit_message_text(
-                        chat_id=telegram_id,
-                        message_id=payment_message_id,
-                        text="✅ Оплата успешно получена! Отправляю фотографию без водяных знаков..."
-                    )
-                except:
-                    pass
-
-                data = await state.get_data()
-                images = data.get("images", {})
-                logger.info(f"Poll start for user {telegram_id}, requested key {image_key}, images keys: {list(images.keys())}")
-
-                if image_key in images:
-                    img_data = images[image_key]
-                    clean_bytes = img_data['clean']
-                    result_msg_id = img_data['result_msg_id']
-                    logger.info(f"Sending clean for key {image_key}: bytes size {len(clean_bytes)}, msg_id {result_msg_id}")
-
-                    temp_path = await save_temp_bytes(clean_bytes, f"clean_{telegram_id}_{image_key}.png")
-                    await bot.send_document(
-                        telegram_id,
-                        document=FSInputFile(temp_path, filename="photo_clean.png"),
-                        caption="✅ Спасибо за оплату! Вот ваша фотография без водяных знаков 🙌"
-                    )
-                    cleanup_file(temp_path)
-
-                    if result_msg_id:
-                        try:
-                            await bot.edit_message_reply_markup(
-                                chat_id=telegram_id,
-                                message_id=result_msg_id,
-                                reply_markup=get_paid_keyboard()
-                            )
-                        except Exception as e:
-                            logger.error(f"Failed to edit result message {result_msg_id}: {e}")
-
-                    images[image_key]['paid'] = True
-                    await state.update_data(images=images)
-                    logger.info(f"Payment completed for key {image_key}, updated paid=True")
-
-                # To'lov xabarini o'chirish
-                try:
-                    await bot.delete_message(telegram_id, payment_message_id)
-                except:
-                    pass
-
-                await asyncio.sleep(2)
+    if invoice_id in _delivering:
+        return
+    _delivering.add(invoice_id)
+    try:
+        await _deliver_payment(telegram_id, invoice_id, state, bot, payment_message_id, image_key)
+    finally:
+        _delivering.discard(invoice_id)
+
+
+async def _deliver_payment(
+    telegram_id: int,
+    invoice_id: str,
+    state: FSMContext,
+    bot,
+    payment_message_id: Optional[int],
+    image_key: str
+):
+    try:
+        await bot.edit_message_text(
+            chat_id=telegram_id,
+            message_id=payment_message_id,
+            text="✅ Оплата успешно получена! Отправляю фотографию без водяных знаков..."
+        )
+    except:
+        pass
+
+    PAYMENT_EVENTS.inc(event="paid")
+    data = await state.get_data()
+    images = data.get("images", {})
+    logger.info(f"Delivery start for user {telegram_id}, requested key {image_key}, images keys: {list(images.keys())}")
+
+    if image_key in images:
+        img_data = images[image_key]
+        blob_keys = stored_keys(img_data)
+        stored = await load_stored(img_data)
+        result_msg_id = img_data['result_msg_id']
+
+        if stored is None:
+            logger.error(f"Stored results {blob_keys} missing for paid invoice {invoice_id}")
+            await bot.send_message(
+                telegram_id,
+                f"⚠️ Оплата получена, но изображение не найдено. Напишите в поддержку {settings.support_username}, мы поможем!"
+            )
+        else:
+            try:
+                with STAGE_SECONDS.time(stage="rebuild_clean"):
+                    clean_images = await asyncio.gather(*[
+                        rebuild(telegram_id, rebuild_clean, original_bytes, stored_bytes)
+                        for original_bytes, stored_bytes in stored
+                    ])
+            except Exception as e:
+                # Bloblar o'chirilmaydi va paid qo'yilmaydi - yetkazishni qayta urinish mumkin
+                logger.error(f"Rebuild failed for paid invoice {invoice_id}, key {image_key}: {e}")
                 await bot.send_message(
                     telegram_id,
-                    "📸 Хотите обработать ещё одну фотографию?\n"
-                    "Просто отправьте её в чат 👇\n\n"
-                    f"💰 Стоимость обработки: {settings.price}₽"
+                    f"⚠️ Оплата получена, но не удалось подготовить изображение. Напишите в поддержку {settings.support_username}, мы поможем!"
+                )
+                await notify_support(
+                    bot,
+                    f"⚠️ Не удалось подготовить оплаченное изображение: invoice {invoice_id}, user {telegram_id}, key {image_key}"
                 )
                 return
-    
-    # 10 minut o'tdi, to'lov qilinmagan
+            logger.info(f"Sending {len(clean_images)} clean image(s) for key {image_key}, msg_id {result_msg_id}")
+            with STAGE_SECONDS.time(stage="send_clean"):
+                await send_clean_images(bot, telegram_id, clean_images)
+            for blob_key in blob_keys:
+                await blob_store.delete(blob_key)
+
+        if result_msg_id:
+            try:
+                await bot.edit_message_reply_markup(
+                    chat_id=telegram_id,
+                    message_id=result_msg_id,
+                    reply_markup=get_paid_keyboard()
+                )
+            except Exception as e:
+                logger.error(f"Failed to edit result message {result_msg_id}: {e}")
+
+        # Kutish davomida saqlangan boshqa previewlar yo'qolmasligi uchun faqat shu yozuv yangilanadi
+        await update_image(state, image_key, paid=True)
+        logger.info(f"Payment completed for key {image_key}, updated paid=True")
+
+    # To'lov xabarini o'chirish
+    try:
+        await bot.delete_message(telegram_id, payment_message_id)
+    except:
+        pass
+
+    await asyncio.sleep(2)
+    await bot.send_message(
+        telegram_id,
+        "📸 Хотите обработать ещё одну фотографию?\n"
+        "Просто отправьте её в чат 👇\n\n"
+        f"💰 Стоимость обработки: {settings.price}₽"
+    )
+
+
+async def recover_payment(bot, telegram_id: int, invoice_id: str):
+    """Poller kutmayotgan to'langan invoice (lokal muddati o'tgan, restart, worker qulagan) FSM orqali yetkaziladi"""
+    if invoice_id in _delivering:
+        return
+    state = user_state(bot, telegram_id)
+    found = await find_invoice_image(state, invoice_id)
+    if found is None:
+        logger.error(f"Paid invoice {invoice_id} of user {telegram_id} has no image in FSM")
+        await bot.send_message(
+            telegram_id,
+            f"⚠️ Оплата получена, но изображение не найдено. Напишите в поддержку {settings.support_username}, мы поможем!"
+        )
+        await notify_support(bot, f"⚠️ Payment {invoice_id} of user {telegram_id} succeeded, but no image was found to deliver")
+        return
+    image_key, img_data = found
+    if img_data.get('paid'):
+        return
+    logger.info(f"Recovering delivery of invoice {invoice_id} for user {telegram_id}, key {image_key}")
+    await deliver_payment(telegram_id, invoice_id, state, bot, img_data.get('payment_msg_id'), image_key)
+
+
+async def resend_preview(bot, telegram_id: int, state: FSMContext, image_key: str, markup: InlineKeyboardMarkup):
+    """Natija xabari tahrirlanmasa (o'chirilgan yoki juda eski), preview saqlangan natijadan qayta yig'iladi"""
+    data = await state.get_data()
+    images = data.get("images", {})
+    stored = await load_stored(images[image_key]) if image_key in images else None
+    if not stored:
+        return
+    preview_bytes = await rebuild(telegram_id, rebuild_preview, *stored[0])
+    msg = await bot.send_photo(
+        telegram_id,
+        photo=BufferedInputFile(preview_bytes, filename=preview_filename("preview")),
+        caption=f"💰 Полная версия без водяных знаков — {settings.price * len(stored)}₽",
+        reply_markup=markup
+    )
+    await update_image(state, image_key, result_msg_id=msg.message_id)
+
+
+async def expire_invoice(
+    telegram_id: int,
+    invoice_id: str,
+    state: FSMContext,
+    bot,
+    payment_message_id: int,
+    image_key: str,
+    result_message_id: int
+):
+    # Invoice muddati o'tdi yoki bekor qilindi, to'lov qilinmagan
     logger.info(f"Invoice {invoice_id} expired without payment")
-    
+    PAYMENT_EVENTS.inc(event="expired")
+
     try:
         # To'lov xabarini o'chirish
         await bot.delete_message(telegram_id, payment_message_id)
     except Exception as e:
         logger.error(f"Failed to delete payment message: {e}")
-    
+
     # Result message tugmasini yangilash - qayta to'lov qilish imkoniyati
+    expired_markup = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔄 Создать новый счет", callback_data=f"pay_{telegram_id}_{image_key}")],
+        [InlineKeyboardButton(text="Не нравится результат", callback_data="not_like")]
+    ])
     try:
-        expired_markup = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="🔄 Создать новый счет", callback_data=f"pay_{telegram_id}_{image_key}")],
-            [InlineKeyboardButton(text="Не нравится результат", callback_data="not_like")]
-        ])
         await bot.edit_message_reply_markup(
             chat_id=telegram_id,
             message_id=result_message_id,
             reply_markup=expired_markup
         )
-        
+    except Exception as e:
+        logger.warning(f"Result message {result_message_id} is not editable ({e}), sending the preview again")
+        try:
+            await resend_preview(bot, telegram_id, state, image_key, expired_markup)
+        except Exception as e:
+            logger.error(f"Failed to resend preview for key {image_key}: {e}")
+
+    try:
         await bot.send_message(
             telegram_id,
             "⏰ Время оплаты истекло. Счет больше не действителен.\n"
@@ -215,8 +429,8 @@ async def pay_processing_handler(callback: CallbackQuery, state: FSMContext):
     invoice_created_at = img_data.get('invoice_created_at')
     
     if invoice_created_at:
-        elapsed = datetime.now() - invoice_created_at
-        if elapsed >= timedelta(minutes=10):
+        elapsed = timedelta(seconds=time.time() - invoice_created_at)
+        if elapsed >= timedelta(minutes=settings.invoice_ttl_minutes):
             # Invoice muddati o'tgan
             await callback.answer(
                 "⏰ Время оплаты истекло. Счет больше не действителен.\n"
@@ -230,7 +444,7 @@ async def pay_processing_handler(callback: CallbackQuery, state: FSMContext):
             ])
             await callback.message.edit_reply_markup(reply_markup=expired_markup)
         else:
-            remaining = timedelta(minutes=10) - elapsed
+            remaining = timedelta(minutes=settings.invoice_ttl_minutes) - elapsed
             minutes = int(remaining.total_seconds() // 60)
             seconds = int(remaining.total_seconds() % 60)
             await callback.answer(
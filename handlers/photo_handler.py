@@ -1,151 +1,263 @@
 import asyncio
 import uuid
+from functools import partial
+from typing import Optional
 from aiogram import Router, F
-from aiogram.types import Message, FSInputFile
+from aiogram.types import Message, BufferedInputFile, InputMediaPhoto, InputMediaDocument
 from aiogram.fsm.context import FSMContext
+from database.fsm_storage import update_image
 from services.image_service import ImageService
+from services.blob_store import blob_store
+from services.job_scheduler import job_scheduler
 from keyboards.inline_keyboards import get_result_keyboard
-from utils.file_utils import download_temp_file, save_temp_bytes, cleanup_file, cleanup_temp_dir
-from photos.processor import validate_image_bytes, is_valid_image_file
+from utils.file_utils import download_to_bytes
+from photos.processor import is_valid_image_file
+from photos.pipeline import ImageInfo, is_mask, preview_filename, probe_image
 from config import settings
 from utils.logger import logger
+from utils.metrics import FAILURES, PAYMENT_EVENTS, RETRIES, STAGE_SECONDS
 
 router = Router()
 
-async def process_image_with_retry(original_bytes, retries=2):
+async def process_image_with_retry(original_bytes, size, retries=2):
     last_exception = None
     for attempt in range(1, retries + 1):
         try:
-            clean_bytes = ImageService.remove_background(original_bytes)
-            watermarked_bytes = ImageService.add_watermarks(clean_bytes)
-            return clean_bytes, watermarked_bytes
+            return await ImageService.process(original_bytes, size)
         except Exception as e:
             last_exception = e
-            await asyncio.sleep(1)  
+            FAILURES.inc(stage="process", error=type(e).__name__)
+            if attempt < retries:
+                RETRIES.inc(operation="process_image")
+            await asyncio.sleep(1)
     raise last_exception
 
 
-@router.message(F.photo)
-async def photo_handler(message: Message, state: FSMContext):
+async def fetch_image(bot, file_id: str) -> tuple[bytes, Optional[ImageInfo]]:
+    with STAGE_SECONDS.time(stage="download"):
+        file = await bot.get_file(file_id)
+        original_bytes = await download_to_bytes(bot, file.file_path)
+    # Faqat sarlavha o'qiladi, piksellar keyingi bosqichda bir marta dekodlanadi
+    with STAGE_SECONDS.time(stage="validate"):
+        info = probe_image(original_bytes)
+    return original_bytes, info
+
+
+async def run_in_queue(message: Message, original_bytes: bytes, info: ImageInfo, subject: str, queued_subject: str):
+    """subject - "Обрабатываю ..." uchun, queued_subject - egalik olmoshi bilan butun ibora ("Ваш файл")"""
+    job = job_scheduler.submit(message.from_user.id, partial(process_image_with_retry, original_bytes, info.size, retries=2))
+    position = job_scheduler.position(job)
+    if position:
+        await message.answer(
+            f"⏳ {queued_subject} в очереди: {position}-е место. Обработка начнётся автоматически."
+        )
+    else:
+        await message.answer(f"⏳ Обрабатываю {subject}...")
+    return await job_scheduler.wait(job)
+
+
+async def save_result(state: FSMContext, user_id: int, image_key: str, results: list[tuple[bytes, bytes]], result_msg_id: int):
+    """results: (original, saqlanadigan natija) juftliklari.
+
+    Natija mask bo'lsa original ham saqlanadi: toza PNG to'lov paytida shulardan yig'iladi.
+    """
+    result_keys, original_keys = [], []
+    for index, (original_bytes, stored_bytes) in enumerate(results):
+        result_key = f"result_{image_key}_{index}"
+        await blob_store.put(result_key, stored_bytes)
+        result_keys.append(result_key)
+        original_key = None
+        if is_mask(stored_bytes):
+            original_key = f"original_{image_key}_{index}"
+            await blob_store.put(original_key, original_bytes)
+        original_keys.append(original_key)
+
+    images = await update_image(
+        state, image_key,
+        result_keys=result_keys,
+        original_keys=original_keys,
+        paid=False,
+        result_msg_id=result_msg_id,
+    )
+    PAYMENT_EVENTS.inc(event="preview")
+    logger.info(f"Added {len(result_keys)} image(s) as {image_key} to state for user {user_id}, current keys: {list(images.keys())}")
+
+
+async def download_album_item(message: Message) -> Optional[tuple[bytes, ImageInfo]]:
+    if message.photo:
+        file_id = message.photo[-1].file_id
+    elif message.document and is_valid_image_file(message.document.file_name, message.document.mime_type):
+        file_id = message.document.file_id
+    else:
+        return None
+
+    original_bytes, info = await fetch_image(message.bot, file_id)
+    if info is None:
+        return None
+    return original_bytes, info
+
+
+async def album_handler(message: Message, state: FSMContext, album: list[Message]):
     user_id = message.from_user.id
+    album = album[:settings.album_max_items]
+    as_documents = message.document is not None
 
-    if message.caption:
+    await message.answer(f"⏳ Обрабатываю альбом из {len(album)} изображений...")
+
+    originals = await asyncio.gather(*[download_album_item(item) for item in album], return_exceptions=True)
+    originals = [item for item in originals if isinstance(item, tuple)]
+    if not originals:
+        await message.answer("❌ В альбоме нет подходящих изображений. Попробуйте JPEG или PNG.")
         return
 
-    temp_path = temp_dir = water_path = None
-    try:
-        await message.answer("⏳ Обрабатываю изображение... Это может занять до 1 минуты.")
+    # Har bir rasm scheduler orqali: parallellik foydalanuvchi limiti bilan cheklanadi
+    outputs = await asyncio.gather(*[
+        job_scheduler.run(user_id, partial(process_image_with_retry, original_bytes, info.size, retries=2))
+        for original_bytes, info in originals
+    ], return_exceptions=True)
+    results = []
+    for (original_bytes, _), output in zip(originals, outputs):
+        if isinstance(output, BaseException):
+            logger.error(f"Album item failed for user {user_id}: {output}")
+        else:
+            results.append((original_bytes, *output))
+    if not results:
+        await message.answer("❌ Ошибка при обработке альбома. Попробуйте снова.")
+        return
+
+    count = len(results)
+    image_key = str(uuid.uuid4())
+    markup = get_result_keyboard(user_id, image_key)
+    with STAGE_SECONDS.time(stage="send_preview"):
+        if count > 1:
+            # WEBP hujjatni Telegram stiker deb ko'rsatmasligi uchun tur aniqlash o'chiriladi
+            media_cls = partial(InputMediaDocument, disable_content_type_detection=True) if as_documents else InputMediaPhoto
+            await message.answer_media_group(
+                media=[
+                    media_cls(media=BufferedInputFile(watermarked_bytes, filename=preview_filename(f"preview_{index + 1}")))
+                    for index, (_, _, watermarked_bytes) in enumerate(results)
+                ],
+                reply_to_message_id=message.message_id
+            )
+            result_msg = await message.answer(
+                f"✅ Готово — {count} изображений с водяными знаками.\n\n"
+                f"💰 Полные версии без водяных знаков — {settings.price * count}₽\n"
+                "Нажмите кнопку ниже, чтобы оплатить все сразу.",
+                reply_markup=markup
+            )
+        elif as_documents:
+            # Bitta natija ham foydalanuvchi yuborgan ko'rinishda: hujjat sifatida
+            result_msg = await message.answer_document(
+                document=BufferedInputFile(results[0][2], filename=preview_filename("background_removed_watermark")),
+                caption=(
+                    "✅ Превью с водяными знаками.\n\n"
+                    f"💰 Для получения версии без водяных знаков — оплатите {settings.price}₽"
+                ),
+                disable_content_type_detection=True,
+                reply_markup=markup,
+                reply_to_message_id=message.message_id
+            )
+        else:
+            result_msg = await message.answer_photo(
+                photo=BufferedInputFile(results[0][2], filename=preview_filename("preview")),
+                caption=(
+                    "✅ Готово — пример с водяными знаками.\n\n"
+                    f"💰 Полная версия без водяных знаков — {settings.price}₽\n"
+                    "Нажмите кнопку ниже, чтобы оплатить."
+                ),
+                reply_markup=markup,
+                reply_to_message_id=message.message_id
+            )
+
+    await save_result(state, user_id, image_key, [(original, stored) for original, stored, _ in results], result_msg.message_id)
 
-        photo = message.photo[-1]
-        file = await message.bot.get_file(photo.file_id)
-        temp_path, temp_dir = await download_temp_file(message.bot, file.file_path, user_id)
 
-        with open(temp_path, "rb") as f:
-            original_bytes = f.read()
+@router.message(F.photo)
+async def photo_handler(message: Message, state: FSMContext, album: Optional[list[Message]] = None):
+    user_id = message.from_user.id
+
+    try:
+        # Albom izohi butun albomga tegishli - u izoh tufayli tashlab yuborilmaydi
+        if album and len(album) > 1:
+            await album_handler(message, state, album)
+            return
 
-        if not validate_image_bytes(original_bytes):
+        if message.caption:
+            return
+
+        photo = message.photo[-1]
+        original_bytes, info = await fetch_image(message.bot, photo.file_id)
+        if info is None:
             await message.answer("❌ Неверный формат фото. Попробуйте JPEG или PNG.")
             return
 
-        clean_bytes, watermarked_bytes = await process_image_with_retry(original_bytes, retries=2)
+        stored_bytes, watermarked_bytes = await run_in_queue(message, original_bytes, info, "изображение", "Ваше изображение")
 
         image_key = str(uuid.uuid4())
-        logger.info(f"User {user_id}: Generated key {image_key} for document, clean_bytes size: {len(clean_bytes)}")
-
-        water_path = await save_temp_bytes(watermarked_bytes, f"water_{user_id}_{image_key}.png")
+        logger.info(f"User {user_id}: Generated key {image_key}, stored result size: {len(stored_bytes)}")
         markup = get_result_keyboard(user_id, image_key)
 
-        result_msg = await message.answer_photo(
-            photo=FSInputFile(water_path),
-            caption=(
-                "✅ Готово — пример с водяными знаками.\n\n"
-                f"💰 Полная версия без водяных знаков — {settings.price}₽\n"
-                "Нажмите кнопку ниже, чтобы оплатить."
-            ),
-            reply_markup=markup,
-            reply_to_message_id=message.message_id
-        )
+        with STAGE_SECONDS.time(stage="send_preview"):
+            result_msg = await message.answer_photo(
+                photo=BufferedInputFile(watermarked_bytes, filename=preview_filename("preview")),
+                caption=(
+                    "✅ Готово — пример с водяными знаками.\n\n"
+                    f"💰 Полная версия без водяных знаков — {settings.price}₽\n"
+                    "Нажмите кнопку ниже, чтобы оплатить."
+                ),
+                reply_markup=markup,
+                reply_to_message_id=message.message_id
+            )
 
-        data = await state.get_data()
-        images = data.get('images', {})
-        images[image_key] = {
-            'clean': clean_bytes,
-            'watermarked': watermarked_bytes,
-            'paid': False,
-            'result_msg_id': result_msg.message_id
-        }
-        await state.update_data(images=images)
-        logger.info(f"Added document {image_key} to state for user {user_id}, current keys: {list(images.keys())}")
+        await save_result(state, user_id, image_key, [(original_bytes, stored_bytes)], result_msg.message_id)
 
     except Exception as e:
         logger.exception(f"Error in photo_handler for user {user_id}: {e}")
         await message.answer("❌ Ошибка при обработке фото. Попробуйте другую фотографию.")
-    finally:
-        cleanup_file(temp_path)
-        cleanup_file(water_path)
-        if temp_dir:
-            cleanup_temp_dir(temp_dir)
 
 @router.message(F.document)
-async def document_handler(message: Message, state: FSMContext):
+async def document_handler(message: Message, state: FSMContext, album: Optional[list[Message]] = None):
     user_id = message.from_user.id
 
-    if message.caption:
-        return
-
-    temp_path = temp_dir = water_path = None
     try:
-        await message.answer("⏳ Обрабатываю файл... Это может занять до 1 минуты.")
+        # Albom izohi butun albomga tegishli - u izoh tufayli tashlab yuborilmaydi
+        if album and len(album) > 1:
+            await album_handler(message, state, album)
+            return
+
+        if message.caption:
+            return
 
-        document = message.document 
+        document = message.document
         if not is_valid_image_file(document.file_name, document.mime_type):
             await message.answer("❌ Файл не является изображением.")
             return
 
-        file = await message.bot.get_file(document.file_id)
-        temp_path, temp_dir = await download_temp_file(message.bot, file.file_path, user_id)
-
-        with open(temp_path, "rb") as f:
-            original_bytes = f.read()
-
-        if not validate_image_bytes(original_bytes):
+        original_bytes, info = await fetch_image(message.bot, document.file_id)
+        if info is None:
             await message.answer("❌ Неверный формат файла. Попробуйте JPEG или PNG.")
             return
 
-        clean_bytes, watermarked_bytes = await process_image_with_retry(original_bytes, retries=2)
+        stored_bytes, watermarked_bytes = await run_in_queue(message, original_bytes, info, "файл", "Ваш файл")
 
-        # UNIQUE KEY
         image_key = str(uuid.uuid4())
-        logger.info(f"User {user_id}: Generated key {image_key} for document, clean_bytes size: {len(clean_bytes)}")
-
-        water_path = await save_temp_bytes(watermarked_bytes, f"water_{user_id}_{image_key}.png")
+        logger.info(f"User {user_id}: Generated key {image_key}, stored result size: {len(stored_bytes)}")
         markup = get_result_keyboard(user_id, image_key)
 
-        result_msg = await message.answer_document(
-            document=FSInputFile(water_path, filename="background_removed_watermark.png"),
-            caption=(
-                "✅ Превью с водяными знаками.\n\n"
-                f"💰 Для получения версии без водяных знаков — оплатите {settings.price}₽"
-            ),
-            reply_markup=markup,
-            reply_to_message_id=message.message_id
-        )
+        with STAGE_SECONDS.time(stage="send_preview"):
+            result_msg = await message.answer_document(
+                document=BufferedInputFile(watermarked_bytes, filename=preview_filename("background_removed_watermark")),
+                caption=(
+                    "✅ Превью с водяными знаками.\n\n"
+                    f"💰 Для получения версии без водяных знаков — оплатите {settings.price}₽"
+                ),
+                # .webp hujjat stiker bo'lib, izoh va to'lov tugmasi yo'qolmasligi uchun
+                disable_content_type_detection=True,
+                reply_markup=markup,
+                reply_to_message_id=message.message_id
+            )
 
-        data = await state.get_data()
-        images = data.get('images', {})
-        images[image_key] = {
-            'clean': clean_bytes,
-            'watermarked': watermarked_bytes,
-            'paid': False,
-            'result_msg_id': result_msg.message_id
-        }
-        await state.update_data(images=images)
-        logger.info(f"Added document {image_key} to state for user {user_id}, current keys: {list(images.keys())}")
+        await save_result(state, user_id, image_key, [(original_bytes, stored_bytes)], result_msg.message_id)
 
     except Exception as e:
         await message.answer("❌ Ошибка при обработке файла. Попробуйте снова.")
-    finally:
-        cleanup_file(temp_path)
-        cleanup_file(water_path)
-        if temp_dir:
-            cleanup_temp_dir(temp_dir)
\ No newline at end of file
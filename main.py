@@ -1,32 +1,218 @@
 # main.py
 import asyncio
 import logging
+import multiprocessing
+import os
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from config import settings
 from handlers import start_router, photo_router, payment_router, admin_router
+from handlers.payment_handler import restore_pending_invoices
 from middlewares.logging_middleware import LoggingMiddleware
+from middlewares.album_middleware import AlbumMiddleware
+from middlewares.db_session_middleware import DbSessionMiddleware
 from database.connection import init_db
+from database.fsm_storage import fsm_storage
+from services.backends import get_backend, close_backends
+from services.cpu_pool import cpu_pool
+from services.blob_store import blob_store
+from services.result_cache import result_cache
+from services.payment_poller import payment_poller
+from services.yookassa_gateway import YooKassaGateway
+from web.yookassa_webhook import start_yookassa_webhook
+from web.metrics import start_metrics_server
+from web.telegram_webhook import (
+    UpdateForwarder, create_front_app, create_front_yookassa_app, create_telegram_app,
+    set_telegram_webhook, start_app, worker_port,
+)
 from utils.logger import logger
 
-async def main():
-    bot = Bot(token=settings.bot_token, default=DefaultBotProperties(parse_mode="HTML"))
-    dp = Dispatcher(storage=MemoryStorage())
+
+def build_bot() -> Bot:
+    session = None
+    if settings.telegram_api_base:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_base))
+    return Bot(token=settings.bot_token, session=session, default=DefaultBotProperties(parse_mode="HTML"))
+
+
+def build_dispatcher(worker_index: int = 0, workers: int = 1) -> Dispatcher:
+    dp = Dispatcher(storage=fsm_storage)
 
     dp.message.outer_middleware(LoggingMiddleware())
     dp.callback_query.outer_middleware(LoggingMiddleware())
+    dp.message.outer_middleware(DbSessionMiddleware())
+    dp.callback_query.outer_middleware(DbSessionMiddleware())
+    dp.message.middleware(AlbumMiddleware(latency=settings.album_latency))
 
     dp.include_router(start_router)
     dp.include_router(photo_router)
     dp.include_router(payment_router)
     dp.include_router(admin_router)
 
+    async def restore_state(bot: Bot):
+        # Restartdan keyin: disk bloblari indeksi va ochiq invoicelar
+        await blob_store.load()
+        await restore_pending_invoices(bot, worker_index, workers)
+
+    dp.startup.register(get_backend().warmup)
+    dp.startup.register(restore_state)
+    dp.shutdown.register(blob_store.flush)
+    dp.shutdown.register(close_backends)
+    dp.shutdown.register(cpu_pool.shutdown)
+    dp.shutdown.register(YooKassaGateway.close)
+    return dp
+
+
+def start_background_tasks() -> list[asyncio.Task]:
+    return [
+        asyncio.create_task(blob_store.run_cleanup()),
+        asyncio.create_task(fsm_storage.run_cleanup()),
+        asyncio.create_task(payment_poller.run()),
+    ]
+
+
+def stop_background_tasks(tasks: list[asyncio.Task]):
+    for task in tasks:
+        task.cancel()
+
+
+async def run_polling():
+    bot = build_bot()
+    dp = build_dispatcher()
+    tasks = start_background_tasks()
+    webhook_runner = await start_yookassa_webhook(bot) if settings.yookassa_webhook_enabled else None
+    metrics_runner = await start_metrics_server() if settings.metrics_enabled else None
+
     logger.info("Starting bot polling...")
-    await dp.start_polling(bot, skip_updates=True)
+    try:
+        await bot.delete_webhook()
+        await dp.start_polling(bot, skip_updates=True)
+    finally:
+        stop_background_tasks(tasks)
+        if webhook_runner:
+            await webhook_runner.cleanup()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+
+
+async def run_webhook():
+    bot = build_bot()
+    dp = build_dispatcher()
+    tasks = start_background_tasks()
+    webhook_runner = await start_yookassa_webhook(bot) if settings.yookassa_webhook_enabled else None
+    metrics_runner = await start_metrics_server() if settings.metrics_enabled else None
+    runner = await start_app(create_telegram_app(bot, dp), settings.telegram_webhook_host, settings.telegram_webhook_port)
+    await set_telegram_webhook(bot, dp.resolve_used_update_types())
+
+    logger.info(f"Telegram webhook listening on {settings.telegram_webhook_host}:{settings.telegram_webhook_port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        stop_background_tasks(tasks)
+        await runner.cleanup()
+        if webhook_runner:
+            await webhook_runner.cleanup()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+
+
+async def run_worker(index: int):
+    bot = build_bot()
+    dp = build_dispatcher(index, settings.telegram_webhook_workers)
+    tasks = start_background_tasks()
+    runner = await start_app(create_telegram_app(bot, dp, internal=True), "127.0.0.1", worker_port(index))
+
+    logger.info(f"Update worker {index} listening on 127.0.0.1:{worker_port(index)}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        stop_background_tasks(tasks)
+        await runner.cleanup()
+
+
+def use_worker_dirs(index: int, workers: int):
+    """Har bir worker o'z blob va kesh papkasiga ega: boshqa jarayon fayllarini
+    yetim deb o'chirmaydi va kesh limitini ikki marta hisoblamaydi"""
+    blob_store.spill_dir = os.path.join(settings.blob_spill_dir, f"worker-{index}")
+    result_cache.cache_dir = os.path.join(settings.result_cache_dir, f"worker-{index}")
+    result_cache.max_bytes = settings.result_cache_max_mb * 1024 * 1024 // workers
+
+
+def worker_entry(index: int):
+    use_worker_dirs(index, settings.telegram_webhook_workers)
+    try:
+        asyncio.run(run_worker(index))
+    except KeyboardInterrupt:
+        pass
+
+
+def spawn_worker(context, index: int) -> multiprocessing.Process:
+    process = context.Process(target=worker_entry, args=(index,), name=f"bot-worker-{index}")
+    process.start()
+    return process
+
+
+async def supervise_workers(context, workers: list, interval: float = 1.0):
+    """Yiqilgan worker o'rniga yangisi ishga tushiriladi: uning navbatidagi updatelar front da kutib turadi"""
+    while True:
+        await asyncio.sleep(interval)
+        for index, process in enumerate(workers):
+            if not process.is_alive():
+                logger.error(f"Worker {index} exited with code {process.exitcode}, restarting")
+                workers[index] = spawn_worker(context, index)
+
+
+async def run_front():
+    """Bitta tashqi webhook + user_id bo'yicha bo'lingan bir nechta worker jarayon"""
+    context = multiprocessing.get_context("spawn")
+    workers = [spawn_worker(context, index) for index in range(settings.telegram_webhook_workers)]
+    supervisor = asyncio.create_task(supervise_workers(context, workers))
+
+    forwarder = UpdateForwarder(settings.telegram_webhook_workers)
+    await forwarder.start()
+    runners = [await start_app(create_front_app(forwarder), settings.telegram_webhook_host, settings.telegram_webhook_port)]
+    if settings.yookassa_webhook_enabled:
+        runners.append(await start_app(
+            create_front_yookassa_app(forwarder), settings.yookassa_webhook_host, settings.yookassa_webhook_port
+        ))
+
+    # Webhook faqat workerlar tayyor bo'lganda o'rnatiladi
+    await forwarder.wait_ready()
+    bot = build_bot()
+    try:
+        await set_telegram_webhook(bot, build_dispatcher().resolve_used_update_types())
+    finally:
+        await bot.session.close()
+
+    logger.info(
+        f"Telegram webhook front listening on {settings.telegram_webhook_host}:{settings.telegram_webhook_port}, "
+        f"{len(workers)} workers"
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        supervisor.cancel()
+        for runner in runners:
+            await runner.cleanup()
+        await forwarder.close()
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join(timeout=10)
+
+
+async def main():
+    if not settings.telegram_webhook_enabled:
+        await run_polling()
+    elif settings.telegram_webhook_workers > 1:
+        await run_front()
+    else:
+        await run_webhook()
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        logger.info("Bot stopped by user")
\ No newline at end of file
+        logger.info("Bot stopped by user")
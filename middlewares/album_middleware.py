@@ -0,0 +1,27 @@
+# middlewares/album_middleware.py
+import asyncio
+from aiogram import BaseMiddleware
+from aiogram.types import Message
+
+
+class AlbumMiddleware(BaseMiddleware):
+    """Media group (albom) qismlarini yig'ib, handlerni bir marta chaqiradi"""
+
+    def __init__(self, latency: float = 0.6):
+        self.latency = latency
+        self.albums: dict[str, list[Message]] = {}
+
+    async def __call__(self, handler, event, data):
+        if not isinstance(event, Message) or not event.media_group_id:
+            return await handler(event, data)
+
+        album = self.albums.get(event.media_group_id)
+        if album is not None:
+            album.append(event)
+            return None
+
+        self.albums[event.media_group_id] = [event]
+        await asyncio.sleep(self.latency)
+        album = self.albums.pop(event.media_group_id)
+        data["album"] = sorted(album, key=lambda m: m.message_id)
+        return await handler(event, data)
@@ -0,0 +1,12 @@
+# middlewares/db_session_middleware.py
+from aiogram import BaseMiddleware
+from database.connection import AsyncSessionLocal
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """Har bir update uchun bitta sessiya; ulanish birinchi so'rovda olinadi va oxirida qaytariladi"""
+
+    async def __call__(self, handler, event, data):
+        async with AsyncSessionLocal() as session:
+            data["session"] = session
+            return await handler(event, data)
@@ -0,0 +1,51 @@
+"""add daily stats rollup and users created_at index
+
+Revision ID: c3a91f7d2e40
+Revises: 78a7cfa6f775
+Create Date: 2026-10-17 10:12:05.413920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a91f7d2e40'
+down_revision: Union[str, Sequence[str], None] = '78a7cfa6f775'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_users_created_at'), 'users', ['created_at'], unique=False)
+    op.create_table('daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('new_users', sa.Integer(), nullable=False),
+    sa.Column('invoices', sa.Integer(), nullable=False),
+    sa.Column('paid', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    # Mavjud ma'lumotlardan rollupni bir marta to'ldirish; paid/revenue to'lov kuni
+    # bo'yicha f0a6d2c84b17 (payments.paid_at) migratsiyasida to'ldiriladi
+    op.execute("""
+        INSERT INTO daily_stats (day, new_users, invoices, paid, revenue)
+        SELECT day, SUM(new_users), SUM(invoices), SUM(paid), SUM(revenue)
+        FROM (
+            SELECT created_at::date AS day, COUNT(*) AS new_users, 0 AS invoices, 0 AS paid, 0 AS revenue
+            FROM users WHERE created_at IS NOT NULL GROUP BY 1
+            UNION ALL
+            SELECT created_at::date, 0, COUNT(*), 0, 0
+            FROM payments WHERE created_at IS NOT NULL GROUP BY 1
+        ) AS source
+        GROUP BY day
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_stats')
+    op.drop_index(op.f('ix_users_created_at'), table_name='users')
@@ -0,0 +1,28 @@
+"""add payments user_id status index
+
+Revision ID: d4b82e19a6c1
+Revises: c3a91f7d2e40
+Create Date: 2026-10-17 11:03:41.207514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4b82e19a6c1'
+down_revision: Union[str, Sequence[str], None] = 'c3a91f7d2e40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_payments_user_id_status', 'payments', ['user_id', 'status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_payments_user_id_status', table_name='payments')
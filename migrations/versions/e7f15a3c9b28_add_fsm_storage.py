@@ -0,0 +1,36 @@
+"""add fsm storage table
+
+Revision ID: e7f15a3c9b28
+Revises: d4b82e19a6c1
+Create Date: 2026-10-17 12:26:09.584113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7f15a3c9b28'
+down_revision: Union[str, Sequence[str], None] = 'd4b82e19a6c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('fsm_storage',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('state', sa.String(), nullable=True),
+    sa.Column('data', sa.LargeBinary(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_fsm_storage_expires_at'), 'fsm_storage', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_fsm_storage_expires_at'), table_name='fsm_storage')
+    op.drop_table('fsm_storage')
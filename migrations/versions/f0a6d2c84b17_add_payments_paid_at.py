@@ -0,0 +1,38 @@
+"""add payments paid_at and date paid stats by it
+
+Revision ID: f0a6d2c84b17
+Revises: e7f15a3c9b28
+Create Date: 2026-10-17 14:02:27.318604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f0a6d2c84b17'
+down_revision: Union[str, Sequence[str], None] = 'e7f15a3c9b28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('payments', sa.Column('paid_at', sa.DateTime(), nullable=True))
+    # Eski to'lovlarning o'tish vaqti saqlanmagan: yaratilgan vaqt eng yaqin taxmin
+    op.execute("UPDATE payments SET paid_at = created_at WHERE status = 'succeeded' AND paid_at IS NULL")
+    # paid/revenue jonli rollup bilan bir xil qoida bo'yicha qayta hisoblanadi: paid_at kuni
+    op.execute("UPDATE daily_stats SET paid = 0, revenue = 0")
+    op.execute("""
+        INSERT INTO daily_stats (day, new_users, invoices, paid, revenue)
+        SELECT paid_at::date, 0, 0, COUNT(*), COALESCE(SUM(amount), 0)
+        FROM payments WHERE paid_at IS NOT NULL GROUP BY 1
+        ON CONFLICT (day) DO UPDATE SET paid = EXCLUDED.paid, revenue = EXCLUDED.revenue
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('payments', 'paid_at')
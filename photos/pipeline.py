@@ -0,0 +1,231 @@
+# photos/pipeline.py
+import io
+from typing import Optional
+import numpy as np
+from PIL import Image, ImageOps
+from config import settings
+from photos.watermark import watermark_renderer
+from utils.logger import logger
+
+SUPPORTED_FORMATS = {"JPEG", "PNG", "WEBP", "BMP", "TIFF", "GIF", "MPO"}
+UPLOAD_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+PREVIEW_EXTENSIONS = {"JPEG": "jpg", "WEBP": "webp", "PNG": "png"}
+# JPEG da shaffoflik yo'q, preview oq fonga qo'yiladi
+PREVIEW_BACKGROUND = (255, 255, 255, 255)
+# Natija va original ranglari shu o'lchamda solishtiriladi
+MASK_CHECK_SIDE = 256
+EXIF_ORIENTATION = 0x0112
+# 5-8 orientatsiyalarda rasm 90 gradusga buriladi, eni va bo'yi almashadi
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+class ImageInfo:
+    """Faqat sarlavhadan o'qilgan ma'lumot: format, o'lcham va EXIF orientatsiya.
+
+    Bosqichlar orasida shu obyekt uzatiladi, to'liq dekodlash faqat kerakli joyda bajariladi.
+    """
+
+    __slots__ = ("format", "width", "height", "orientation")
+
+    def __init__(self, format: str, width: int, height: int, orientation: int = 1):
+        self.format = format
+        self.width = width
+        self.height = height
+        self.orientation = orientation
+
+    @property
+    def size(self) -> tuple[int, int]:
+        """Orientatsiya qo'llanganidan keyingi (foydalanuvchi ko'radigan) o'lcham"""
+        if self.orientation in TRANSPOSED_ORIENTATIONS:
+            return self.height, self.width
+        return self.width, self.height
+
+
+def _orientation(image: Image.Image, image_bytes: bytes) -> int:
+    """decode_image dagi exif_transpose qaysi formatda bo'lsa ham aylantiradi, shuning uchun hamma format o'qiladi"""
+    # PNG getexif() eXIf chunki IDAT dan keyin bo'lsa butun rasmni dekodlaydi:
+    # chunk umuman yo'q bo'lsa bunga hojat yo'q
+    if image.format == "PNG" and "exif" not in image.info and b"eXIf" not in image_bytes:
+        return 1
+    return image.getexif().get(EXIF_ORIENTATION, 1)
+
+
+def probe_image(image_bytes: bytes) -> Optional[ImageInfo]:
+    """Piksellarni dekodlamasdan, faqat sarlavha bo'yicha tekshiradi"""
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        if image.format not in SUPPORTED_FORMATS or not image.width or not image.height:
+            return None
+        return ImageInfo(image.format, image.width, image.height, _orientation(image, image_bytes))
+    except Exception:
+        return None
+
+
+def decode_image(image_bytes: bytes, max_side: Optional[int] = None) -> Image.Image:
+    """Bitta to'liq dekodlash: JPEG uchun kichraytirilgan DCT rejimi, so'ng EXIF orientatsiya"""
+    image = Image.open(io.BytesIO(image_bytes))
+    if max_side and image.format == "JPEG":
+        # draft() dekoderga 1/2, 1/4, 1/8 masshtabda o'qishni buyuradi
+        image.draft("RGB", (max_side, max_side))
+    return ImageOps.exif_transpose(image)
+
+
+def prepare_upload(image_bytes: bytes, max_side: int, fmt: str, quality: int) -> tuple[bytes, str, tuple[int, int]]:
+    info = probe_image(image_bytes)
+    image = decode_image(image_bytes, max_side).convert("RGB")
+    original_size = info.size if info else image.size
+
+    if max_side and max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    fmt = fmt.upper()
+    buffered = io.BytesIO()
+    if fmt == "PNG":
+        image.save(buffered, format="PNG", compress_level=1)
+    else:
+        image.save(buffered, format=fmt, quality=quality)
+    logger.debug(f"prepare_upload: {original_size} -> {image.size} {fmt}, {len(image_bytes)} -> {buffered.tell()} bytes")
+    return buffered.getvalue(), UPLOAD_MIME_TYPES[fmt], original_size
+
+
+def preview_filename(stem: str) -> str:
+    return f"{stem}.{PREVIEW_EXTENSIONS[settings.preview_format.upper()]}"
+
+
+def alpha_bbox(image: Image.Image, margin: int = 0) -> Optional[tuple[int, int, int, int]]:
+    """To'liq shaffof bo'lmagan piksellar chegarasi (margin bilan); rasm butunlay shaffof bo'lsa None"""
+    alpha = np.asarray(image.getchannel("A"))
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if not rows.size:
+        return None
+    cols = np.flatnonzero(alpha.any(axis=0))
+    height, width = alpha.shape
+    return (
+        max(int(cols[0]) - margin, 0),
+        max(int(rows[0]) - margin, 0),
+        min(int(cols[-1]) + 1 + margin, width),
+        min(int(rows[-1]) + 1 + margin, height),
+    )
+
+
+def _fit(size: tuple[int, int], max_side: int) -> tuple[int, int]:
+    scale = min(1.0, max_side / max(size))
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def encode_clean(image: Image.Image) -> bytes:
+    array = np.array(image)
+    # Shaffof piksellarning rangi ko'rinmaydi: nolga tenglansa PNG filtrlari ancha yaxshi siqadi
+    array[array[..., 3] == 0] = 0
+    buffered = io.BytesIO()
+    Image.fromarray(array, "RGBA").save(
+        buffered, format="PNG",
+        compress_level=settings.clean_png_compress_level, optimize=settings.clean_png_optimize,
+    )
+    return buffered.getvalue()
+
+
+def encode_preview(image: Image.Image) -> bytes:
+    """Chat uchun preview: avval kichraytiriladi, watermark preview o'lchamida chiziladi"""
+    max_side = settings.preview_max_side
+    if max_side and max(image.size) > max_side:
+        image = image.resize(_fit(image.size, max_side), Image.Resampling.BICUBIC, reducing_gap=2.0)
+    preview = watermark_renderer.apply(image)
+
+    fmt = settings.preview_format.upper()
+    buffered = io.BytesIO()
+    if fmt == "JPEG":
+        background = Image.new("RGBA", preview.size, PREVIEW_BACKGROUND)
+        Image.alpha_composite(background, preview).convert("RGB").save(
+            buffered, format="JPEG", quality=settings.preview_quality
+        )
+    elif fmt == "WEBP":
+        preview.save(buffered, format="WEBP", quality=settings.preview_quality, method=settings.preview_webp_method)
+    else:
+        preview.save(buffered, format="PNG", compress_level=settings.clean_png_compress_level)
+    return buffered.getvalue()
+
+
+def autocrop(image: Image.Image) -> Image.Image:
+    if not settings.autocrop_enabled:
+        return image
+    bbox = alpha_bbox(image, settings.autocrop_margin)
+    if bbox is None or bbox == (0, 0, *image.size):
+        return image
+    return image.crop(bbox)
+
+
+def encode_mask(mask: Image.Image) -> bytes:
+    buffered = io.BytesIO()
+    mask.save(buffered, format="PNG", compress_level=9)
+    return buffered.getvalue()
+
+
+def is_mask(stored_bytes: bytes) -> bool:
+    """Saqlangan natija bir kanalli mask (L) mi yoki to'liq RGBA PNG - faqat sarlavha o'qiladi"""
+    return Image.open(io.BytesIO(stored_bytes)).mode == "L"
+
+
+def mask_matches(image: Image.Image, original_bytes: bytes) -> bool:
+    """Natija ranglari asl rasmnikiga yaqinmi: shundagina original + mask natijani qayta tiklay oladi.
+
+    Generativ dvigatellar obyektni qayta chizishi mumkin, bunday natija to'liq saqlanadi.
+    """
+    small = image.resize(_fit(image.size, MASK_CHECK_SIDE), Image.Resampling.BILINEAR)
+    reference = decode_image(original_bytes, MASK_CHECK_SIDE).convert("RGB").resize(small.size, Image.Resampling.BILINEAR)
+    result = np.asarray(small, dtype=np.int16)
+    visible = result[..., 3] > 0
+    if not visible.any():
+        return True
+    diff = np.abs(result[..., :3] - np.asarray(reference, dtype=np.int16))[visible]
+    return float(diff.mean()) <= settings.mask_max_color_diff
+
+
+def compose_cutout(original_bytes: bytes, stored_bytes: bytes) -> Image.Image:
+    """Original piksellari + mask: foni olib tashlangan RGBA rasm (auto-crop bilan)"""
+    mask = Image.open(io.BytesIO(stored_bytes))
+    image = decode_image(original_bytes).convert("RGB")
+    if image.size != mask.size:
+        image = image.resize(mask.size, Image.Resampling.LANCZOS)
+    image.putalpha(mask)
+    return autocrop(image)
+
+
+def rebuild_clean(original_bytes: Optional[bytes], stored_bytes: bytes) -> bytes:
+    """To'lovdan keyin yuboriladigan PNG; to'liq saqlangan natija o'zgarishsiz qaytadi"""
+    if not is_mask(stored_bytes):
+        return stored_bytes
+    return encode_clean(compose_cutout(original_bytes, stored_bytes))
+
+
+def rebuild_preview(original_bytes: Optional[bytes], stored_bytes: bytes) -> bytes:
+    if not is_mask(stored_bytes):
+        return encode_preview(Image.open(io.BytesIO(stored_bytes)).convert("RGBA"))
+    return encode_preview(compose_cutout(original_bytes, stored_bytes))
+
+
+def render_outputs(result_bytes: bytes, size: Optional[tuple[int, int]] = None,
+                   original_bytes: Optional[bytes] = None) -> tuple[bytes, bytes]:
+    """Dvigatel natijasini bir marta dekodlab, saqlanadigan natija va watermarkli previewni qaytaradi.
+
+    Saqlanadigan natija imkon bo'lsa faqat alfa mask (original bilan birga
+    saqlanadi), aks holda to'lov uchun tayyor to'liq PNG.
+    """
+    image = Image.open(io.BytesIO(result_bytes))
+    has_alpha = "A" in image.getbands() or "transparency" in image.info
+    image = image.convert("RGBA")
+    if size is not None and image.size != tuple(size):
+        image = image.resize(tuple(size), Image.Resampling.LANCZOS)
+
+    stored_bytes = None
+    if settings.mask_storage_enabled and original_bytes is not None and has_alpha and mask_matches(image, original_bytes):
+        # Mask auto-cropdan oldin olinadi: qayta tiklashda crop xuddi shunday takrorlanadi
+        stored_bytes = encode_mask(image.getchannel("A"))
+    image = autocrop(image)
+    if stored_bytes is None:
+        stored_bytes = encode_clean(image)
+
+    preview_bytes = encode_preview(image)
+    logger.debug(f"render_outputs: {image.size}, {len(result_bytes)} -> stored {len(stored_bytes)} bytes, "
+                 f"preview {len(preview_bytes)} bytes")
+    return stored_bytes, preview_bytes
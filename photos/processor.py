@@ -1,17 +1,7 @@
 # photos/processor.py
-import io
 from typing import Optional
-from PIL import Image
 from utils.logger import logger
 
-def validate_image_bytes(image_bytes: bytes) -> bool:
-    try:
-        img = Image.open(io.BytesIO(image_bytes))
-        img.verify()
-        return True
-    except Exception as e:
-        return False
-    
 def is_valid_image_file(filename: Optional[str], mime_type: Optional[str]) -> bool:
     valid_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tiff', '.tif'}
     
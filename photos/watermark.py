@@ -0,0 +1,108 @@
+# photos/watermark.py
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from config import settings
+from utils.logger import logger
+
+WATERMARK_TEXT = "Обработка фото"
+WATERMARK_FILL = (0, 0, 0, 200)
+
+FONT_PATHS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",  # Regular
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "/System/Library/Fonts/Helvetica.ttc",
+    "C:\\Windows\\Fonts\\arial.ttf",
+    "arial.ttf"
+]
+
+
+def font_size_for(width: int, height: int) -> int:
+    return max(13, min(29, min(width, height) // 45))
+
+
+@lru_cache(maxsize=32)
+def load_font(font_size: int):
+    for font_path in FONT_PATHS:
+        try:
+            font = ImageFont.truetype(font_path, font_size)
+            logger.debug(f"Loaded font: {font_path}")
+            return font
+        except (OSError, IOError):
+            continue
+
+    logger.warning("No TrueType font found, using default")
+    try:
+        return ImageFont.load_default(size=font_size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=32)
+def render_tile(font_size: int) -> np.ndarray:
+    """Bitta matn katakchasi: matn + oraliq, RGBA massiv ko'rinishida"""
+    font = load_font(font_size)
+    bbox = font.getbbox(WATERMARK_TEXT)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+
+    tile_width = max(int(round(text_width * 1.2)), bbox[2], 1)
+    tile_height = max(int(round(text_height * 1.5)), bbox[3], 1)
+
+    tile = Image.new("RGBA", (tile_width, tile_height), (0, 0, 0, 0))
+    ImageDraw.Draw(tile).text((0, 0), WATERMARK_TEXT, font=font, fill=WATERMARK_FILL, stroke_width=0)
+
+    array = np.asarray(tile)
+    array.setflags(write=False)
+    return array
+
+
+def _build_overlay(width: int, height: int) -> Image.Image:
+    tile = render_tile(font_size_for(width, height))
+    tile_height, tile_width = tile.shape[:2]
+
+    # Panjara rasm markaziga nisbatan tekislanadi (avvalgi draw.text joylashuvi bilan bir xil)
+    num_cols = int(width / tile_width) + 2
+    num_rows = int(height / tile_height) + 2
+    start_x = int((width - (num_cols - 1) * tile_width) / 2)
+    start_y = int((height - (num_rows - 1) * tile_height) / 2)
+    shift_x = -start_x % tile_width
+    shift_y = -start_y % tile_height
+
+    reps_x = (width + shift_x) // tile_width + 1
+    reps_y = (height + shift_y) // tile_height + 1
+    tiled = np.tile(tile, (reps_y, reps_x, 1))
+    overlay = tiled[shift_y:shift_y + height, shift_x:shift_x + width]
+    return Image.fromarray(np.ascontiguousarray(overlay))
+
+
+class WatermarkRenderer:
+    def __init__(self, max_overlays: int):
+        self.max_overlays = max_overlays
+        self._overlays: "OrderedDict[tuple[int, int], Image.Image]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def overlay_for(self, width: int, height: int) -> Image.Image:
+        key = (width, height)
+        with self._lock:
+            overlay = self._overlays.get(key)
+            if overlay is not None:
+                self._overlays.move_to_end(key)
+                return overlay
+
+        overlay = _build_overlay(width, height)
+        if self.max_overlays > 0:
+            with self._lock:
+                self._overlays[key] = overlay
+                while len(self._overlays) > self.max_overlays:
+                    self._overlays.popitem(last=False)
+        return overlay
+
+    def apply(self, image: Image.Image) -> Image.Image:
+        image = image.convert("RGBA")
+        return Image.alpha_composite(image, self.overlay_for(*image.size))
+
+
+watermark_renderer = WatermarkRenderer(max_overlays=settings.watermark_overlay_cache_size)
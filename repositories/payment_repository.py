@@ -1,7 +1,9 @@
 # repositories/payment_repository.py
+from datetime import datetime
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from database.models import Payment
+from database.models import Payment, User
+from repositories.stats_repository import StatsRepository
 
 class PaymentRepository:
     def __init__(self, session: AsyncSession):
@@ -10,11 +12,43 @@ class PaymentRepository:
     async def create(self, user_id: int, invoice_id: str, amount: int):
         payment = Payment(user_id=user_id, invoice_id=invoice_id, amount=amount)
         self.session.add(payment)
+        await StatsRepository(self.session).increment(invoices=1)
         await self.session.commit()
         await self.session.refresh(payment)
         return payment
 
+    async def get_by_invoice_id(self, invoice_id: str):
+        stmt = select(Payment).where(Payment.invoice_id == invoice_id)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def list_pending(self, since) -> list:
+        """Berilgan vaqtdan keyin yaratilgan ochiq to'lovlar: (invoice_id, telegram_id, created_at)"""
+        stmt = (
+            select(Payment.invoice_id, User.telegram_id, Payment.created_at)
+            .join(User, User.id == Payment.user_id)
+            .where(Payment.status == "pending", Payment.created_at >= since)
+        )
+        result = await self.session.execute(stmt)
+        return result.all()
+
     async def update_status(self, invoice_id: str, status: str):
-        stmt = update(Payment).where(Payment.invoice_id == invoice_id).values(status=status)
-        await self.session.execute(stmt)
-        await self.session.commit()
\ No newline at end of file
+        await self.update_status_many([invoice_id], status)
+
+    async def update_status_many(self, invoice_ids: list[str], status: str):
+        # Faqat haqiqatda holati o'zgargan to'lovlar rollupga qo'shiladi
+        now = datetime.utcnow()
+        values = {"status": status}
+        if status == "succeeded":
+            values["paid_at"] = now
+        stmt = (
+            update(Payment)
+            .where(Payment.invoice_id.in_(invoice_ids), Payment.status != status)
+            .values(**values)
+            .returning(Payment.amount)
+        )
+        result = await self.session.execute(stmt)
+        amounts = [amount or 0 for amount in result.scalars().all()]
+        if status == "succeeded" and amounts:
+            await StatsRepository(self.session).increment(day=now.date(), paid=len(amounts), revenue=sum(amounts))
+        await self.session.commit()
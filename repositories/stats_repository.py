@@ -0,0 +1,31 @@
+# repositories/stats_repository.py
+from datetime import date, datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.models import DailyStats
+
+
+class StatsRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def increment(self, day: date = None, **deltas: int):
+        """Kunlik rollup qatoriga qiymatlarni qo'shadi (commit chaqiruvchi tomonda)"""
+        day = day or datetime.utcnow().date()
+        values = {"new_users": 0, "invoices": 0, "paid": 0, "revenue": 0, **deltas}
+        stmt = insert(DailyStats).values(day=day, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DailyStats.day],
+            set_={
+                column: getattr(DailyStats, column) + getattr(stmt.excluded, column)
+                for column in deltas
+            },
+        )
+        await self.session.execute(stmt)
+
+    async def get_range(self, days: int) -> list[DailyStats]:
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        stmt = select(DailyStats).where(DailyStats.day >= since).order_by(DailyStats.day.desc())
+        result = await self.session.execute(stmt)
+        return list(result.scalars().all())
@@ -1,41 +1,100 @@
-from sqlalchemy import select, and_, func
+from collections import OrderedDict
+from sqlalchemy import select, update, and_, func, literal_column
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from database.models import User, Payment
+from repositories.stats_repository import StatsRepository
+from config import settings
 from datetime import datetime, timedelta
 
+
+class CachedUser:
+    __slots__ = ("id", "telegram_id", "username", "first_name", "has_free_used")
+
+    def __init__(self, id: int, telegram_id: int, username: str, first_name: str, has_free_used: bool):
+        self.id = id
+        self.telegram_id = telegram_id
+        self.username = username
+        self.first_name = first_name
+        self.has_free_used = has_free_used
+
+
+class UserCache:
+    """telegram_id -> foydalanuvchi id va flaglar uchun chegaralangan LRU"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[int, CachedUser]" = OrderedDict()
+
+    def get(self, telegram_id: int):
+        user = self._items.get(telegram_id)
+        if user is not None:
+            self._items.move_to_end(telegram_id)
+        return user
+
+    def put(self, user: CachedUser):
+        self._items[user.telegram_id] = user
+        self._items.move_to_end(user.telegram_id)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
+user_cache = UserCache(settings.user_cache_size)
+
+
 class UserRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def get_or_create(self, telegram_id: int, username: str = None, first_name: str = None) -> User:
-        stmt = select(User).where(User.telegram_id == telegram_id)
-        result = await self.session.execute(stmt)
-        user = result.scalar_one_or_none()
-        if not user:
-            user = User(telegram_id=telegram_id, username=username, first_name=first_name)
-            self.session.add(user)
-            await self.session.commit()
-            await self.session.refresh(user)
+    async def get_or_create(self, telegram_id: int, username: str = None, first_name: str = None) -> CachedUser:
+        cached = user_cache.get(telegram_id)
+        if cached is not None and (username is None or username == cached.username) \
+                and (first_name is None or first_name == cached.first_name):
+            return cached
+
+        # Bitta INSERT ... ON CONFLICT DO UPDATE ... RETURNING; parallel birinchi murojaatlarda ham xavfsiz
+        stmt = insert(User).values(telegram_id=telegram_id, username=username, first_name=first_name)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={
+                "username": func.coalesce(stmt.excluded.username, User.username),
+                "first_name": func.coalesce(stmt.excluded.first_name, User.first_name),
+            },
+        ).returning(
+            User.id, User.username, User.first_name, User.has_free_used,
+            literal_column("(xmax = 0)").label("inserted"),
+        )
+        row = (await self.session.execute(stmt)).one()
+        if row.inserted:
+            await StatsRepository(self.session).increment(new_users=1)
+        await self.session.commit()
+
+        user = CachedUser(row.id, telegram_id, row.username, row.first_name, bool(row.has_free_used))
+        user_cache.put(user)
         return user
 
     async def set_free_used(self, telegram_id: int):
         user = await self.get_or_create(telegram_id)
         if not user.has_free_used:
-            user.has_free_used = True
+            stmt = update(User).where(User.id == user.id).values(has_free_used=True)
+            await self.session.execute(stmt)
             await self.session.commit()
-            await self.session.refresh(user)
+            user.has_free_used = True
 
     async def has_free_used(self, telegram_id: int) -> bool:
-        stmt = select(User).where(User.telegram_id == telegram_id)
+        cached = user_cache.get(telegram_id)
+        if cached is not None:
+            return cached.has_free_used
+        stmt = select(User.has_free_used).where(User.telegram_id == telegram_id)
         result = await self.session.execute(stmt)
-        user = result.scalar_one_or_none()
-        return user.has_free_used if user else False
+        return bool(result.scalar_one_or_none())
 
     async def has_paid(self, telegram_id: int) -> bool:
         user = await self.get_or_create(telegram_id)
-        stmt = select(func.count(Payment.id)).where(and_(Payment.user_id == user.id, Payment.status == 'succeeded'))
+        # (user_id, status) kompozit indeksi bo'yicha
+        stmt = select(Payment.id).where(and_(Payment.user_id == user.id, Payment.status == 'succeeded')).limit(1)
         result = await self.session.execute(stmt)
-        return result.scalar() > 0
+        return result.first() is not None
 
     async def get_stats(self) -> dict:
         today = datetime.utcnow().date()
@@ -43,18 +102,13 @@ class UserRepository:
         today_start = datetime.combine(today, datetime.min.time())
         yesterday_start = datetime.combine(yesterday, datetime.min.time())
 
-        stmt_today = select(User.id).where(User.created_at >= today_start)
-        result_today = await self.session.execute(stmt_today)
-        new_today = len(result_today.scalars().all())
-
-        stmt_yesterday = select(User.id).where(
-            User.created_at >= yesterday_start, User.created_at < today_start
+        # Bitta so'rovda COUNT agregatlari, created_at indeksidan foydalaniladi
+        stmt = select(
+            func.count(User.id).filter(User.created_at >= today_start),
+            func.count(User.id).filter(User.created_at >= yesterday_start, User.created_at < today_start),
+            func.count(User.id),
         )
-        result_yesterday = await self.session.execute(stmt_yesterday)
-        new_yesterday = len(result_yesterday.scalars().all())
-
-        stmt_total = select(User.id)
-        result_total = await self.session.execute(stmt_total)
-        total = len(result_total.scalars().all())
+        result = await self.session.execute(stmt)
+        new_today, new_yesterday, total = result.one()
 
-        return {"new_today": new_today, "new_yesterday": new_yesterday, "total": total}
\ No newline at end of file
+        return {"new_today": new_today, "new_yesterday": new_yesterday, "total": total}
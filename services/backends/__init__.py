@@ -0,0 +1,38 @@
+# services/backends/__init__.py
+from typing import Dict, Optional
+from config import settings
+from .base import BackgroundRemovalBackend
+
+_backends: Dict[str, BackgroundRemovalBackend] = {}
+
+
+def create_backend(name: str) -> BackgroundRemovalBackend:
+    name = name.strip()
+    if name == "openrouter" or name.startswith("openrouter:"):
+        # "openrouter:<model>" - boshqa model bilan alohida provayder
+        from .openrouter_backend import OpenRouterBackend
+        return OpenRouterBackend(name.partition(":")[2] or None)
+    if name == "onnx":
+        # onnxruntime faqat lokal dvigatel tanlanganda import qilinadi
+        from .onnx_backend import OnnxBackend
+        return OnnxBackend()
+    if name == "router":
+        from .router import ProviderRouter
+        return ProviderRouter([create_backend(spec) for spec in settings.bg_providers.split(",") if spec.strip()])
+    raise ValueError(f"Unknown background removal backend: {name}")
+
+
+def get_backend(name: Optional[str] = None) -> BackgroundRemovalBackend:
+    name = name or settings.bg_backend
+    if name not in _backends:
+        _backends[name] = create_backend(name)
+    return _backends[name]
+
+
+async def close_backends():
+    for backend in _backends.values():
+        await backend.close()
+    _backends.clear()
+
+
+__all__ = ["BackgroundRemovalBackend", "create_backend", "get_backend", "close_backends"]
@@ -0,0 +1,20 @@
+from abc import ABC, abstractmethod
+
+
+class BackgroundRemovalBackend(ABC):
+    name: str = "base"
+
+    @property
+    def cache_namespace(self) -> str:
+        """Natija keshi kaliti uchun: natijaga ta'sir qiluvchi sozlamalar shu yerga kiradi"""
+        return self.name
+
+    @abstractmethod
+    async def remove(self, image_bytes: bytes) -> bytes:
+        """Rasm baytlarini qabul qiladi va foni olib tashlangan PNG qaytaradi (o'lchami asldan farq qilishi mumkin)"""
+
+    async def warmup(self):
+        pass
+
+    async def close(self):
+        pass
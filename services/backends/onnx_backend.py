@@ -0,0 +1,143 @@
+import asyncio
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import cv2
+import numpy as np
+import onnxruntime as ort
+import pooch
+from PIL import Image
+from photos.pipeline import decode_image
+from config import settings
+from services.backends.base import BackgroundRemovalBackend
+from utils.logger import logger
+
+MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+def resolve_model_path() -> str:
+    if settings.onnx_model_path and os.path.exists(settings.onnx_model_path):
+        return settings.onnx_model_path
+    # Model fayli yo'q bo'lsa, bir marta yuklab olinadi va keshda saqlanadi
+    return pooch.retrieve(
+        url=settings.onnx_model_url,
+        known_hash=settings.onnx_model_hash or None,
+        path=settings.onnx_model_dir,
+        progressbar=False,
+    )
+
+
+class OnnxSessionPool:
+    def __init__(self, model_path: str, size: int, intra_op_threads: int, inter_op_threads: int):
+        self.model_path = model_path
+        self.size = size
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="onnx")
+        self._sessions: Optional[asyncio.Queue] = None
+        self._lock = asyncio.Lock()
+
+    def _create_session(self) -> ort.InferenceSession:
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return ort.InferenceSession(self.model_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+    async def load(self):
+        if self._sessions is not None:
+            return
+        async with self._lock:
+            if self._sessions is not None:
+                return
+            loop = asyncio.get_running_loop()
+            sessions = await asyncio.gather(*[
+                loop.run_in_executor(self._executor, self._create_session) for _ in range(self.size)
+            ])
+            queue = asyncio.Queue()
+            for session in sessions:
+                queue.put_nowait(session)
+            self._sessions = queue
+            logger.info(f"ONNX session pool ready: {self.size} sessions, model {self.model_path}")
+
+    async def run(self, func, *args):
+        await self.load()
+        session = await self._sessions.get()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, session, *args)
+        finally:
+            self._sessions.put_nowait(session)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._sessions = None
+
+
+def _predict_mask(session: ort.InferenceSession, rgb: np.ndarray, input_size: int) -> np.ndarray:
+    height, width = rgb.shape[:2]
+    resized = cv2.resize(rgb, (input_size, input_size), interpolation=cv2.INTER_AREA)
+    tensor = (resized.astype(np.float32) / 255.0 - MEAN) / STD
+    tensor = np.ascontiguousarray(tensor.transpose(2, 0, 1)[np.newaxis, ...])
+
+    input_name = session.get_inputs()[0].name
+    prediction = session.run(None, {input_name: tensor})[0][0, 0]
+
+    low, high = float(prediction.min()), float(prediction.max())
+    prediction = (prediction - low) / max(high - low, 1e-6)
+    mask = cv2.resize(prediction, (width, height), interpolation=cv2.INTER_LINEAR)
+    return (np.clip(mask, 0.0, 1.0) * 255).astype(np.uint8)
+
+
+def remove_background_with_session(session: ort.InferenceSession, image_bytes: bytes, input_size: int) -> bytes:
+    image = decode_image(image_bytes).convert("RGB")
+    rgb = np.asarray(image)
+    mask = _predict_mask(session, rgb, input_size)
+
+    rgba = np.dstack([rgb, mask])
+    buffered = io.BytesIO()
+    Image.fromarray(rgba).save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+class OnnxBackend(BackgroundRemovalBackend):
+    name = "onnx"
+
+    def __init__(self):
+        self._pool: Optional[OnnxSessionPool] = None
+        self._lock = asyncio.Lock()
+
+    async def _get_pool(self) -> OnnxSessionPool:
+        if self._pool is not None:
+            return self._pool
+        async with self._lock:
+            if self._pool is None:
+                model_path = await asyncio.to_thread(resolve_model_path)
+                self._pool = OnnxSessionPool(
+                    model_path,
+                    size=settings.onnx_pool_size,
+                    intra_op_threads=settings.onnx_intra_op_threads,
+                    inter_op_threads=settings.onnx_inter_op_threads,
+                )
+        return self._pool
+
+    @property
+    def cache_namespace(self) -> str:
+        model = settings.onnx_model_path or settings.onnx_model_url
+        return f"{self.name}:{model}:{settings.onnx_input_size}"
+
+    async def warmup(self):
+        pool = await self._get_pool()
+        await pool.load()
+
+    async def remove(self, image_bytes: bytes) -> bytes:
+        pool = await self._get_pool()
+        return await pool.run(remove_background_with_session, image_bytes, settings.onnx_input_size)
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
@@ -0,0 +1,36 @@
+from typing import Optional
+from config import settings
+from photos.pipeline import prepare_upload
+from services.backends.base import BackgroundRemovalBackend
+from services.cpu_pool import cpu_pool
+from services.openrouter_client import OpenRouterClient
+from utils.metrics import STAGE_SECONDS
+
+
+class OpenRouterBackend(BackgroundRemovalBackend):
+    name = "openrouter"
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model
+        if model:
+            self.name = f"openrouter:{model}"
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}:{settings.upload_max_side}:{settings.upload_format}:{settings.upload_quality}"
+
+    async def remove(self, image_bytes: bytes) -> bytes:
+        with STAGE_SECONDS.time(stage="prepare_upload"):
+            payload, mime_type, _ = await cpu_pool.run(
+                prepare_upload,
+                image_bytes,
+                settings.upload_max_side,
+                settings.upload_format,
+                settings.upload_quality,
+            )
+        # Asl o'lchamga qaytarish render_outputs bosqichida, preview bilan birga bajariladi
+        with STAGE_SECONDS.time(stage="openrouter_request"):
+            return await OpenRouterClient.remove_background(payload, mime_type, self.model)
+
+    async def close(self):
+        await OpenRouterClient.close()
@@ -0,0 +1,207 @@
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+from config import settings
+from services.backends.base import BackgroundRemovalBackend
+from utils.logger import logger
+from utils.metrics import FAILURES, PROVIDER_SECONDS
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProviderStats:
+    """Provayder bo'yicha oxirgi N so'rov: muvaffaqiyatli kechikishlar, xatolar va circuit breaker holati"""
+
+    def __init__(self, window: int):
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.outcomes: deque[bool] = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.inflight = 0
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def available(self, now: float) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return now - self.opened_at >= settings.router_breaker_cooldown
+        # Yarim ochiq holatda bir vaqtda faqat bitta sinov so'rovi
+        return not self.probing
+
+    def begin(self, now: float) -> bool:
+        """Chaqiruv yarim ochiq holatdagi sinov so'rovi bo'lsa True qaytaradi"""
+        if self.state == OPEN:
+            self.state = HALF_OPEN
+        probe = self.state == HALF_OPEN and not self.probing
+        if probe:
+            self.probing = True
+        self.inflight += 1
+        return probe
+
+    def finish(self, probe: bool):
+        self.inflight -= 1
+        # Breaker ochilishidan oldin boshlangan oddiy so'rov sinovni tugatmaydi
+        if probe:
+            self.probing = False
+
+    def record_success(self, latency: float, probe: bool = False):
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+        if probe and self.state == HALF_OPEN:
+            self.state = CLOSED
+            self.outcomes.clear()
+
+    def record_failure(self, now: float, probe: bool = False) -> bool:
+        """Breaker ochilgan bo'lsa True qaytaradi"""
+        self.outcomes.append(False)
+        if (probe and self.state == HALF_OPEN) or (
+            self.state == CLOSED
+            and len(self.outcomes) >= settings.router_breaker_min_requests
+            and self.error_rate >= settings.router_breaker_error_rate
+        ):
+            self.state = OPEN
+            self.opened_at = now
+            return True
+        return False
+
+
+class ProviderRouter(BackgroundRemovalBackend):
+    """Bir nechta dvigatel ustidan marshrutlash.
+
+    Provayderlar berilgan tartibda sinab ko'riladi, ko'p xato qilganlari
+    circuit breaker bilan vaqtincha chetlatiladi. Hedging yoqilgan bo'lsa,
+    birinchi so'rov odatdagi kechikish persentilidan oshib ketganda keyingi
+    provayderga parallel so'rov yuboriladi va birinchi kelgan javob olinadi.
+    """
+
+    name = "router"
+
+    def __init__(self, providers: list[BackgroundRemovalBackend]):
+        if not providers:
+            raise ValueError("Provider router needs at least one provider")
+        names = [provider.name for provider in providers]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            # Statistika va breaker nom bo'yicha: bir xil nomli ikki provayder bitta breakerni ulashardi
+            raise ValueError(f"Duplicate router providers: {', '.join(duplicates)}")
+        self.providers = providers
+        self.stats = {provider.name: ProviderStats(settings.router_window) for provider in providers}
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}({','.join(provider.cache_namespace for provider in self.providers)})"
+
+    def _candidates(self) -> list[BackgroundRemovalBackend]:
+        now = time.monotonic()
+        candidates = [provider for provider in self.providers if self.stats[provider.name].available(now)]
+        # Hamma breaker ochiq bo'lsa ham so'rov rad etilmaydi: eng kam xato qilganidan boshlab
+        return candidates or sorted(self.providers, key=lambda provider: self.stats[provider.name].error_rate)
+
+    def _hedge_delay(self, provider: BackgroundRemovalBackend) -> float:
+        stats = self.stats[provider.name]
+        if len(stats.latencies) < settings.router_breaker_min_requests:
+            return settings.router_hedge_max_delay
+        delay = stats.percentile(settings.router_hedge_percentile)
+        return min(max(delay, settings.router_hedge_min_delay), settings.router_hedge_max_delay)
+
+    async def _call(self, provider: BackgroundRemovalBackend, image_bytes: bytes) -> bytes:
+        stats = self.stats[provider.name]
+        started = time.monotonic()
+        probe = stats.begin(started)
+        try:
+            result = await provider.remove(image_bytes)
+        except asyncio.CancelledError:
+            # Hedgingda yutqazgan so'rov xato hisoblanmaydi
+            raise
+        except Exception as e:
+            FAILURES.inc(stage=f"provider:{provider.name}", error=type(e).__name__)
+            if stats.record_failure(time.monotonic(), probe):
+                logger.warning(f"Circuit breaker opened for provider {provider.name} "
+                               f"(error rate {stats.error_rate:.0%})")
+            raise
+        else:
+            stats.record_success(time.monotonic() - started, probe)
+            PROVIDER_SECONDS.observe(time.monotonic() - started, provider=provider.name)
+            return result
+        finally:
+            stats.finish(probe)
+
+    async def remove(self, image_bytes: bytes) -> bytes:
+        candidates = self._candidates()
+        pending: dict[asyncio.Task, BackgroundRemovalBackend] = {}
+        errors = []
+        next_index = 0
+        hedged = False
+
+        def launch():
+            nonlocal next_index
+            provider = candidates[next_index]
+            next_index += 1
+            pending[asyncio.create_task(self._call(provider, image_bytes))] = provider
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if settings.router_hedge_enabled and not hedged and next_index < len(candidates):
+                    timeout = self._hedge_delay(candidates[0])
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    logger.info(f"Provider {candidates[0].name} is slow (> {timeout:.1f}s), "
+                                f"hedging with {candidates[next_index].name}")
+                    launch()
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    logger.warning(f"Provider {provider.name} failed: {task.exception()}")
+                    errors.append(f"{provider.name}: {task.exception()}")
+
+                # Ishlayotgan so'rov qolmasa, keyingi provayderga o'tiladi
+                if not pending and next_index < len(candidates):
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise Exception(f"All providers failed: {'; '.join(errors)}")
+
+    def snapshot(self) -> list[dict]:
+        return [
+            {
+                "name": provider.name,
+                "state": self.stats[provider.name].state,
+                "error_rate": self.stats[provider.name].error_rate,
+                "p50": self.stats[provider.name].percentile(0.5),
+                "p95": self.stats[provider.name].percentile(0.95),
+                "inflight": self.stats[provider.name].inflight,
+            }
+            for provider in self.providers
+        ]
+
+    async def warmup(self):
+        for provider in self.providers:
+            await provider.warmup()
+
+    async def close(self):
+        for provider in self.providers:
+            await provider.close()
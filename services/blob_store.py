@@ -0,0 +1,219 @@
+import asyncio
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Optional
+from config import settings
+from utils.logger import logger
+
+
+class BlobStore:
+    """Qayta ishlangan rasmlar uchun ombor: xotirada LRU, limitdan oshsa diskka.
+
+    FSM holatida faqat kalit saqlanadi, baytlar shu yerda TTL bilan turadi.
+    Diskdagi faylning mtime qiymati uning muddati: to'xtashda xotiradagi
+    bloblar diskka yoziladi va ishga tushganda indeks diskdan tiklanadi.
+    """
+
+    def __init__(self, spill_dir: str, max_memory_bytes: int, default_ttl: int):
+        self.spill_dir = spill_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.default_ttl = default_ttl
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+        self._memory: "OrderedDict[str, tuple[bytes, float]]" = OrderedDict()
+        self._disk: dict[str, tuple[int, float]] = {}
+        self._lock = asyncio.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, f"{key}.blob")
+
+    def _write_file(self, key: str, data: bytes, expires_at: float):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.spill_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.utime(tmp_path, (expires_at, expires_at))
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _read_file(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _set_expiry(self, key: str, expires_at: float):
+        try:
+            os.utime(self._path(key), (expires_at, expires_at))
+        except OSError:
+            pass
+
+    def _remove_file(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _drop(self, key: str) -> bool:
+        """Kalitni xotira va disk indeksidan olib tashlaydi; fayl bor bo'lsa True"""
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self.memory_bytes -= len(entry[0])
+        disk_entry = self._disk.pop(key, None)
+        if disk_entry is not None:
+            self.disk_bytes -= disk_entry[0]
+            return True
+        return False
+
+    async def _spill(self):
+        while self._memory and self.memory_bytes > self.max_memory_bytes:
+            key, (data, expires_at) = self._memory.popitem(last=False)
+            self.memory_bytes -= len(data)
+            await asyncio.to_thread(self._write_file, key, data, expires_at)
+            self._disk[key] = (len(data), expires_at)
+            self.disk_bytes += len(data)
+
+    async def put(self, key: str, data: bytes, ttl: Optional[int] = None):
+        expires_at = time.time() + (ttl or self.default_ttl)
+        async with self._lock:
+            if self._drop(key):
+                await asyncio.to_thread(self._remove_file, key)
+            self._memory[key] = (data, expires_at)
+            self.memory_bytes += len(data)
+            await self._spill()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        async with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    return entry[0]
+                self._drop(key)
+                return None
+
+            disk_entry = self._disk.get(key)
+            if disk_entry is not None and disk_entry[1] <= now:
+                self._drop(key)
+                await asyncio.to_thread(self._remove_file, key)
+                return None
+
+        # Diskdagi blob xotiraga qaytarilmaydi: u odatda bir marta, to'lovda o'qiladi
+        return await asyncio.to_thread(self._read_file, key)
+
+    async def touch(self, key: str, ttl: int):
+        """Blob muddatini kamida ttl soniyagacha uzaytiradi (masalan, invoice davomida)"""
+        expires_at = time.time() + ttl
+        async with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory[key] = (entry[0], max(entry[1], expires_at))
+                return
+            disk_entry = self._disk.get(key)
+            if disk_entry is not None and expires_at > disk_entry[1]:
+                self._disk[key] = (disk_entry[0], expires_at)
+                await asyncio.to_thread(self._set_expiry, key, expires_at)
+
+    async def exists(self, key: str) -> bool:
+        now = time.time()
+        async with self._lock:
+            entry = self._memory.get(key) or self._disk.get(key)
+            if entry is not None:
+                return entry[1] > now
+        return await asyncio.to_thread(os.path.exists, self._path(key))
+
+    async def delete(self, key: str):
+        async with self._lock:
+            self._drop(key)
+        await asyncio.to_thread(self._remove_file, key)
+
+    async def purge_expired(self) -> int:
+        now = time.time()
+        async with self._lock:
+            expired = [key for key, (_, expires_at) in self._memory.items() if expires_at <= now]
+            expired += [key for key, (_, expires_at) in self._disk.items() if expires_at <= now]
+            for key in expired:
+                if self._drop(key):
+                    await asyncio.to_thread(self._remove_file, key)
+        if expired:
+            logger.info(f"Blob store purged {len(expired)} expired blobs")
+        return len(expired)
+
+    def _scan_dir(self) -> dict[str, tuple[int, float]]:
+        """Oldingi ishga tushirishdan qolgan fayllar: muddati o'tganlari va chala yozilganlari o'chiriladi"""
+        found = {}
+        if not os.path.isdir(self.spill_dir):
+            return found
+        now = time.time()
+        for entry in os.scandir(self.spill_dir):
+            try:
+                stat = entry.stat()
+                if not entry.name.endswith(".blob") or stat.st_mtime <= now:
+                    os.remove(entry.path)
+                    continue
+            except OSError:
+                continue
+            found[entry.name[:-len(".blob")]] = (stat.st_size, stat.st_mtime)
+        return found
+
+    async def load(self):
+        """Ishga tushganda disk indeksini tiklaydi"""
+        async with self._lock:
+            found = await asyncio.to_thread(self._scan_dir)
+            for key, (size, expires_at) in found.items():
+                if key in self._memory or key in self._disk:
+                    continue
+                self._disk[key] = (size, expires_at)
+                self.disk_bytes += size
+        if found:
+            logger.info(f"Blob store restored {len(found)} blobs from {self.spill_dir}")
+
+    async def flush(self):
+        """To'xtashda xotiradagi bloblarni diskka yozadi, restartdan keyin ular yo'qolmaydi"""
+        now = time.time()
+        async with self._lock:
+            count = 0
+            while self._memory:
+                key, (data, expires_at) = self._memory.popitem(last=False)
+                self.memory_bytes -= len(data)
+                if expires_at <= now:
+                    continue
+                await asyncio.to_thread(self._write_file, key, data, expires_at)
+                self._disk[key] = (len(data), expires_at)
+                self.disk_bytes += len(data)
+                count += 1
+        if count:
+            logger.info(f"Blob store flushed {count} blobs to {self.spill_dir}")
+
+    async def run_cleanup(self, interval: int = 60):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.purge_expired()
+            except Exception as e:
+                logger.error(f"Blob store cleanup error: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self.memory_bytes,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self.disk_bytes,
+        }
+
+
+blob_store = BlobStore(
+    spill_dir=settings.blob_spill_dir,
+    max_memory_bytes=settings.blob_memory_mb * 1024 * 1024,
+    default_ttl=settings.blob_ttl_minutes * 60,
+)
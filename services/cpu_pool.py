@@ -0,0 +1,81 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from config import settings
+from utils.logger import logger
+
+
+class CpuPool:
+    """CPU og'ir bosqichlar (dekodlash, watermark, PNG) uchun executor.
+
+    Funksiyalar va argumentlar picklable bo'lishi kerak: process rejimida
+    ular alohida jarayonga bayt ko'rinishida uzatiladi.
+    """
+
+    def __init__(self, mode: str, workers: int, queue_size: int):
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.pending = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            elif self.mode == "thread":
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cpu")
+            else:
+                raise ValueError(f"Unknown CPU pool mode: {self.mode}")
+            logger.info(f"CPU pool started: {self.mode}, {self.workers} workers, queue {self.queue_size}")
+        return self._executor
+
+    async def run(self, func, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers + self.queue_size)
+        self.pending += 1
+        try:
+            # Navbat to'lsa, yangi vazifa joy bo'shaguncha kutadi
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                executor = self._get_executor()
+                try:
+                    return await loop.run_in_executor(executor, func, *args)
+                except BrokenProcessPool:
+                    # Worker jarayon o'ldi (OOM va h.k.) - pool yangidan yaratiladi,
+                    # vazifa bir marta qayta uriniladi
+                    logger.error(f"CPU pool broken while running {getattr(func, '__name__', func)}, restarting")
+                    self._discard(executor)
+                    executor = self._get_executor()
+                    try:
+                        return await loop.run_in_executor(executor, func, *args)
+                    except BrokenProcessPool:
+                        self._discard(executor)
+                        raise
+        finally:
+            self.pending -= 1
+
+    def _discard(self, executor: Executor):
+        # Bir vaqtda yiqilgan bir nechta vazifa faqat o'sha eski poolni tashlaydi
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+cpu_pool = CpuPool(
+    mode=settings.cpu_pool_mode,
+    workers=settings.cpu_pool_workers,
+    queue_size=settings.cpu_pool_queue_size,
+)
@@ -0,0 +1,147 @@
+import asyncio
+import itertools
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict
+from config import settings
+from utils.logger import logger
+from utils.metrics import STAGE_SECONDS
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+
+
+class Job:
+    def __init__(self, user_id: int, factory: Callable[[], Awaitable], priority: int):
+        self.user_id = user_id
+        self.factory = factory
+        self.priority = priority
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.started = False
+        self.submitted_at = time.monotonic()
+
+
+class JobScheduler:
+    """Rasmlarni qayta ishlash navbati.
+
+    Global parallel limit, har bir foydalanuvchi uchun limit va
+    foydalanuvchilar o'rtasida navbatma-navbat (round-robin) tanlash.
+    Yuqori prioritetli navbat (masalan, to'lovdan keyingi ishlov) birinchi olinadi.
+    """
+
+    def __init__(self, max_concurrency: int, per_user_limit: int):
+        self.max_concurrency = max_concurrency
+        self.per_user_limit = per_user_limit
+        self.running = 0
+        self._lanes: Dict[int, "OrderedDict[int, deque[Job]]"] = {
+            PRIORITY_HIGH: OrderedDict(),
+            PRIORITY_NORMAL: OrderedDict(),
+        }
+        self._inflight: Dict[int, int] = {}
+        # user_id -> oxirgi marta ishga tushirilgan vazifaning tartib raqami
+        self._served: Dict[int, int] = {}
+        self._tickets = itertools.count(1)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(jobs) for lane in self._lanes.values() for jobs in lane.values())
+
+    def submit(self, user_id: int, factory: Callable[[], Awaitable], priority: int = PRIORITY_NORMAL) -> Job:
+        job = Job(user_id, factory, priority)
+        self._lanes[priority].setdefault(user_id, deque()).append(job)
+        self._dispatch()
+        return job
+
+    async def run(self, user_id: int, factory: Callable[[], Awaitable], priority: int = PRIORITY_NORMAL):
+        return await self.wait(self.submit(user_id, factory, priority))
+
+    async def wait(self, job: Job):
+        try:
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            # Navbatda turgan vazifa bekor qilinsa, u ishga tushirilmaydi
+            if not job.started:
+                job.future.cancel()
+            raise
+
+    def position(self, job: Job) -> int:
+        """Taxminiy navbat o'rni: 0 - ishlov boshlangan, 1 - keyingi va h.k."""
+        if job.started or job.future.done():
+            return 0
+        ahead = 0
+        for priority, lane in self._lanes.items():
+            if priority < job.priority:
+                ahead += sum(len(jobs) for jobs in lane.values())
+            elif priority == job.priority:
+                own = lane.get(job.user_id, ())
+                index = next((i for i, queued in enumerate(own) if queued is job), len(own))
+                # Round-robin: boshqa har bir foydalanuvchidan ko'pi bilan index + 1 ta vazifa oldinda
+                ahead += index
+                ahead += sum(min(len(jobs), index + 1) for user_id, jobs in lane.items() if user_id != job.user_id)
+        return ahead + 1
+
+    def _pick(self):
+        # Navbat boshidagi emas, eng uzoq vaqt xizmat olmagan foydalanuvchi tanlanadi:
+        # darhol ishga tushgan vazifa ham foydalanuvchini oxirga suradi
+        for lane in self._lanes.values():
+            chosen = None
+            for user_id in list(lane.keys()):
+                if self._inflight.get(user_id, 0) >= self.per_user_limit:
+                    continue
+                jobs = lane[user_id]
+                while jobs and jobs[0].future.done():
+                    jobs.popleft()
+                if not jobs:
+                    del lane[user_id]
+                    continue
+                if chosen is None or self._served.get(user_id, 0) < self._served.get(chosen, 0):
+                    chosen = user_id
+            if chosen is not None:
+                jobs = lane[chosen]
+                job = jobs.popleft()
+                if jobs:
+                    lane.move_to_end(chosen)
+                else:
+                    del lane[chosen]
+                return job
+        return None
+
+    def _dispatch(self):
+        while self.running < self.max_concurrency:
+            job = self._pick()
+            if job is None:
+                return
+            job.started = True
+            self._served[job.user_id] = next(self._tickets)
+            STAGE_SECONDS.observe(time.monotonic() - job.submitted_at, stage="queue_wait")
+            self.running += 1
+            self._inflight[job.user_id] = self._inflight.get(job.user_id, 0) + 1
+            asyncio.create_task(self._execute(job))
+
+    async def _execute(self, job: Job):
+        try:
+            result = await job.factory()
+            if not job.future.done():
+                job.future.set_result(result)
+        except asyncio.CancelledError:
+            job.future.cancel()
+            raise
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+            else:
+                logger.error(f"Job for user {job.user_id} failed after cancel: {e}")
+        finally:
+            self.running -= 1
+            self._inflight[job.user_id] -= 1
+            if not self._inflight[job.user_id]:
+                del self._inflight[job.user_id]
+                if not any(job.user_id in lane for lane in self._lanes.values()):
+                    self._served.pop(job.user_id, None)
+            self._dispatch()
+
+
+job_scheduler = JobScheduler(
+    max_concurrency=settings.scheduler_max_concurrency,
+    per_user_limit=settings.scheduler_per_user_limit,
+)
@@ -0,0 +1,125 @@
+import asyncio
+import base64
+import aiohttp
+from typing import Optional
+from config import settings
+from utils.logger import logger
+
+
+class OpenRouterClient:
+    _session: Optional[aiohttp.ClientSession] = None
+    _lock = asyncio.Lock()
+
+    @classmethod
+    async def get_session(cls) -> aiohttp.ClientSession:
+        if cls._session is not None and not cls._session.closed:
+            return cls._session
+        async with cls._lock:
+            if cls._session is None or cls._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=settings.openrouter_pool_size,
+                    limit_per_host=settings.openrouter_pool_size,
+                    keepalive_timeout=settings.openrouter_keepalive,
+                    ttl_dns_cache=300,
+                )
+                cls._session = aiohttp.ClientSession(
+                    connector=connector,
+                    headers={
+                        "Authorization": f"Bearer {settings.openrouter_token}",
+                        "Content-Type": "application/json"
+                    },
+                )
+                logger.info(f"OpenRouter session opened, pool size {settings.openrouter_pool_size}")
+        return cls._session
+
+    @classmethod
+    async def close(cls):
+        if cls._session is not None and not cls._session.closed:
+            await cls._session.close()
+        cls._session = None
+
+    @staticmethod
+    def _build_payload(image_bytes: bytes, mime_type: str = "image/png", model: Optional[str] = None) -> dict:
+        img_str = base64.b64encode(image_bytes).decode()
+        return {
+            "model": model or settings.openrouter_model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": "Delete background"
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:{mime_type};base64,{img_str}"
+                            }
+                        }
+                    ]
+                }
+            ],
+            "max_tokens": 0,
+            "modalities": ["image", "text"]
+        }
+
+    @classmethod
+    async def _fetch_url(cls, url: str) -> bytes:
+        session = await cls.get_session()
+        timeout = aiohttp.ClientTimeout(total=settings.openrouter_download_timeout)
+        async with session.get(url, timeout=timeout) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    @classmethod
+    async def remove_background(cls, image_bytes: bytes, mime_type: str = "image/png",
+                                model: Optional[str] = None) -> bytes:
+        session = await cls.get_session()
+        payload = cls._build_payload(image_bytes, mime_type, model)
+        timeout = aiohttp.ClientTimeout(
+            total=settings.openrouter_timeout,
+            sock_connect=settings.openrouter_connect_timeout,
+        )
+
+        try:
+            async with session.post(settings.openrouter_url, json=payload, timeout=timeout) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise Exception(f"API request failed: {e!r}")
+
+        message = data.get("choices", [{}])[0].get("message", {})
+
+        if message.get("images"):
+            image_obj = message["images"][0]
+            if image_obj.get("type") == "image_url":
+                image_url = image_obj["image_url"]["url"]
+
+                if image_url.startswith("data:image/png;base64,"):
+                    base64_data = image_url.split(",")[1]
+                    return base64.b64decode(base64_data)
+                else:
+                    raise ValueError("Invalid image URL format - expected data:image/png;base64,")
+            else:
+                raise ValueError("Invalid image object type")
+
+        content = message.get("content", "")
+        if isinstance(content, str):
+            content = content.strip()
+            if content.startswith("data:image/"):
+                if ";base64," in content:
+                    base64_data = content.split(";base64,")[1]
+                    return base64.b64decode(base64_data)
+            elif content.startswith("http"):
+                try:
+                    return await cls._fetch_url(content)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    raise Exception(f"API request failed: {e!r}")
+            else:
+                try:
+                    return base64.b64decode(content)
+                except Exception:
+                    pass
+
+        raise ValueError("No image found in response - check model compatibility or prompt")
@@ -0,0 +1,159 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from config import settings
+from database.connection import get_async_session
+from repositories.payment_repository import PaymentRepository
+from services.payment_service import PaymentService
+from utils.logger import logger
+
+# Muddati o'tgan invoice uchun oxirgi tekshiruv API xatosi tufayli bajarilmasa, shuncha kutib baribir yopiladi
+EXPIRE_GRACE = timedelta(minutes=5)
+
+
+class PendingInvoice:
+    def __init__(self, invoice_id: str, created_at: datetime, on_paid: Callable[[], Awaitable],
+                 on_expired: Callable[[], Awaitable]):
+        self.invoice_id = invoice_id
+        self.created_at = created_at  # UTC
+        self.on_paid = on_paid
+        self.on_expired = on_expired
+        # Webhook yoqilgan bo'lsa, polling faqat sekin zaxira sifatida ishlaydi
+        self.interval = (settings.payment_poll_webhook_interval if settings.yookassa_webhook_enabled
+                         else settings.payment_poll_min_interval)
+        self.next_check = time.monotonic() + self.interval
+        # Muddati o'tganda yakuniy tekshiruv vaqti (xato bo'lsa qayta urinish)
+        self.final_check_at = 0.0
+
+
+class PaymentPoller:
+    """Barcha ochiq invoicelarni bitta tsiklda, YooKassa list API orqali tekshiradi.
+
+    Har bir tekshiruv oralig'ida invoicelar soniga emas, sahifalar soniga
+    bog'liq miqdorda so'rov yuboriladi.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, PendingInvoice] = {}
+        self._wakeup = asyncio.Event()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def register(self, invoice_id: str, on_paid: Callable[[], Awaitable], on_expired: Callable[[], Awaitable],
+                 created_at: Optional[datetime] = None):
+        self._pending[invoice_id] = PendingInvoice(invoice_id, created_at or datetime.utcnow(), on_paid, on_expired)
+        self._wakeup.set()
+
+    async def resolve(self, invoice_id: str, status: str) -> bool:
+        """Invoice yakuniy holatga o'tganda kutayotgan yetkazish logikasini ishga tushiradi.
+
+        Invoice shu jarayonda kutilmayotgan bo'lsa False qaytaradi.
+        """
+        invoice = self._pending.pop(invoice_id, None)
+        if invoice is None:
+            return False
+        callback = invoice.on_paid if status == "succeeded" else invoice.on_expired
+        asyncio.create_task(self.run_callback(invoice_id, callback))
+        return True
+
+    @staticmethod
+    async def run_callback(invoice_id: str, callback: Callable[[], Awaitable]):
+        try:
+            await callback()
+        except Exception as e:
+            logger.exception(f"Payment callback failed for invoice {invoice_id}: {e}")
+
+    def _backoff(self, invoice: PendingInvoice, now: float):
+        # Invoice qariganda tekshiruvlar siyraklashadi
+        max_interval = max(settings.payment_poll_max_interval, invoice.interval)
+        invoice.interval = min(invoice.interval * settings.payment_poll_backoff, max_interval)
+        invoice.next_check = now + invoice.interval
+
+    async def _check(self, due: list[PendingInvoice]):
+        since = min(invoice.created_at for invoice in due) - timedelta(minutes=1)
+        # Ro'yxat so'rovi baribir barcha to'lovlarni qaytaradi, shuning uchun hamma kutilayotganlar solishtiriladi
+        statuses = await PaymentService.list_statuses(since, set(self._pending))
+
+        finished = {invoice_id: status for invoice_id, status in statuses.items()
+                    if status in ("succeeded", "canceled") and invoice_id in self._pending}
+        if not finished:
+            return
+
+        async for session in get_async_session():
+            payment_repo = PaymentRepository(session)
+            for status in ("succeeded", "canceled"):
+                invoice_ids = [invoice_id for invoice_id, value in finished.items() if value == status]
+                if invoice_ids:
+                    await payment_repo.update_status_many(invoice_ids, status)
+
+        for invoice_id, status in finished.items():
+            logger.info(f"Invoice {invoice_id} finished with status {status}")
+            await self.resolve(invoice_id, status)
+
+    async def _expire(self, expiring: list[PendingInvoice], now: float):
+        """Muddati o'tgan invoicelar oxirgi marta tekshiriladi: oxirgi oraliqda to'langan bo'lsa yetkaziladi"""
+        try:
+            await self._check(expiring)
+        except Exception as e:
+            logger.error(f"Final status check failed for {len(expiring)} expiring invoice(s): {e}")
+            give_up_before = datetime.utcnow() - timedelta(minutes=settings.invoice_ttl_minutes) - EXPIRE_GRACE
+            for invoice in expiring:
+                invoice.final_check_at = now + settings.payment_poll_min_interval
+            expiring = [invoice for invoice in expiring if invoice.created_at <= give_up_before]
+
+        for invoice in expiring:
+            if invoice.invoice_id in self._pending:
+                logger.info(f"Invoice {invoice.invoice_id} expired without payment")
+                await self.resolve(invoice.invoice_id, "expired")
+
+    async def _tick(self):
+        now = time.monotonic()
+        expire_before = datetime.utcnow() - timedelta(minutes=settings.invoice_ttl_minutes)
+
+        expiring = [invoice for invoice in self._pending.values()
+                    if invoice.created_at <= expire_before and invoice.final_check_at <= now]
+        if expiring:
+            await self._expire(expiring, now)
+
+        due = [invoice for invoice in self._pending.values()
+               if invoice.next_check <= now and invoice.created_at > expire_before]
+        if not due:
+            return
+
+        try:
+            await self._check(due)
+        except Exception as e:
+            logger.error(f"Payment poller check failed: {e}")
+
+        now = time.monotonic()
+        for invoice in due:
+            if invoice.invoice_id in self._pending:
+                self._backoff(invoice, now)
+
+    def _next_delay(self) -> Optional[float]:
+        if not self._pending:
+            return None
+        now = time.monotonic()
+        ttl = timedelta(minutes=settings.invoice_ttl_minutes)
+        utcnow = datetime.utcnow()
+        delay = min(
+            min(invoice.next_check - now,
+                max((invoice.created_at + ttl - utcnow).total_seconds(), invoice.final_check_at - now))
+            for invoice in self._pending.values()
+        )
+        return max(delay, 0.5)
+
+    async def run(self):
+        while True:
+            self._wakeup.clear()
+            await self._tick()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_delay())
+            except asyncio.TimeoutError:
+                pass
+
+
+payment_poller = PaymentPoller()
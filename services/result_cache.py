@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Optional
+from config import settings
+from utils.logger import logger
+
+
+class ResultCache:
+    def __init__(self, cache_dir: str, max_bytes: int, ttl_seconds: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        # key -> (size, created_at); tartib LRU bo'yicha, oxirida eng yangisi
+        self._index: "OrderedDict[str, tuple[int, float]]" = OrderedDict()
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def make_key(image_bytes: bytes, namespace: str = "") -> str:
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(namespace.encode())
+        digest.update(b"\0")
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def _load_index(self):
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    # worker-N papkalari boshqa jarayonga tegishli
+                    if not name.endswith(".png") or root != os.path.dirname(self._path(name[:-4])):
+                        continue
+                    try:
+                        st = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    entries.append((st.st_atime, name[:-4], st.st_size, st.st_mtime))
+        entries.sort()
+        self._index = OrderedDict((key, (size, mtime)) for _, key, size, mtime in entries)
+        self.total_bytes = sum(size for size, _ in self._index.values())
+        self._loaded = True
+        logger.info(f"Result cache loaded: {len(self._index)} entries, {self.total_bytes} bytes")
+
+    def _remove(self, key: str):
+        size, _ = self._index.pop(key, (0, 0))
+        self.total_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _read(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+            return data
+        except OSError:
+            return None
+
+    def _write(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Atomar yozish: avval vaqtinchalik faylga, keyin os.replace
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _evict(self):
+        while self._index and self.total_bytes > self.max_bytes:
+            key = next(iter(self._index))
+            self._remove(key)
+            self.evictions += 1
+
+    async def get(self, key: str) -> Optional[bytes]:
+        async with self._lock:
+            if not self._loaded:
+                await asyncio.to_thread(self._load_index)
+            entry = self._index.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl_seconds:
+                await asyncio.to_thread(self._remove, key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+
+        data = await asyncio.to_thread(self._read, key)
+        if data is None:
+            async with self._lock:
+                size, _ = self._index.pop(key, (0, 0))
+                self.total_bytes -= size
+                self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    async def set(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        await asyncio.to_thread(self._write, key, data)
+        async with self._lock:
+            if not self._loaded:
+                await asyncio.to_thread(self._load_index)
+            old = self._index.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[0]
+            self._index[key] = (len(data), time.time())
+            self.total_bytes += len(data)
+            if self.total_bytes > self.max_bytes:
+                await asyncio.to_thread(self._evict)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._index),
+            "bytes": self.total_bytes,
+        }
+
+
+result_cache = ResultCache(
+    cache_dir=settings.result_cache_dir,
+    max_bytes=settings.result_cache_max_mb * 1024 * 1024,
+    ttl_seconds=settings.result_cache_ttl_hours * 3600,
+)
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import random
+import aiohttp
+from typing import Optional
+from config import settings
+from utils.logger import logger
+from utils.metrics import FAILURES, RETRIES, STAGE_SECONDS
+
+RETRY_STATUSES = {202, 429, 500, 502, 503, 504}
+
+
+class YooKassaError(Exception):
+    def __init__(self, status: int, body: str):
+        super().__init__(f"YooKassa API error {status}: {body[:300]}")
+        self.status = status
+
+
+class YooKassaGateway:
+    """YooKassa REST API uchun asinxron klient: umumiy keep-alive sessiya, timeout va jitterli qayta urinish"""
+
+    _session: Optional[aiohttp.ClientSession] = None
+    _lock = asyncio.Lock()
+
+    @classmethod
+    async def get_session(cls) -> aiohttp.ClientSession:
+        if cls._session is not None and not cls._session.closed:
+            return cls._session
+        async with cls._lock:
+            if cls._session is None or cls._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=settings.yookassa_pool_size,
+                    keepalive_timeout=30,
+                    ttl_dns_cache=300,
+                )
+                cls._session = aiohttp.ClientSession(
+                    connector=connector,
+                    auth=aiohttp.BasicAuth(settings.yookassa_shop_id, settings.yookassa_secret_key),
+                    timeout=aiohttp.ClientTimeout(
+                        total=settings.yookassa_timeout,
+                        sock_connect=settings.yookassa_connect_timeout,
+                    ),
+                )
+        return cls._session
+
+    @classmethod
+    async def close(cls):
+        if cls._session is not None and not cls._session.closed:
+            await cls._session.close()
+        cls._session = None
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        # Full jitter: 0 .. base * 2^attempt
+        return random.uniform(0, settings.yookassa_backoff_base * (2 ** attempt))
+
+    @classmethod
+    async def _request(cls, method: str, path: str, params: dict = None, body: dict = None,
+                       idempotence_key: str = None) -> dict:
+        session = await cls.get_session()
+        url = f"{settings.yookassa_api_url.rstrip('/')}/{path.lstrip('/')}"
+        headers = {"Content-Type": "application/json"}
+        if idempotence_key:
+            headers["Idempotence-Key"] = idempotence_key
+
+        last_error = None
+        for attempt in range(settings.yookassa_max_attempts):
+            try:
+                with STAGE_SECONDS.time(stage="yookassa_api"):
+                    async with session.request(method, url, params=params, headers=headers,
+                                               data=json.dumps(body) if body is not None else None) as response:
+                        text = await response.text()
+                        status = response.status
+                if status == 200:
+                    return json.loads(text)
+                last_error = YooKassaError(status, text)
+                if status not in RETRY_STATUSES:
+                    raise last_error
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+
+            if attempt < settings.yookassa_max_attempts - 1:
+                delay = cls._backoff(attempt)
+                logger.warning(f"YooKassa {method} {path} failed ({last_error!r}), retry in {delay:.2f}s")
+                RETRIES.inc(operation="yookassa")
+                await asyncio.sleep(delay)
+
+        FAILURES.inc(stage="yookassa_api", error=type(last_error).__name__)
+        raise last_error
+
+    @classmethod
+    async def create_payment(cls, payload: dict, idempotence_key: str) -> dict:
+        # Idempotence-Key tufayli POST ni qayta yuborish xavfsiz
+        return await cls._request("POST", "payments", body=payload, idempotence_key=idempotence_key)
+
+    @classmethod
+    async def get_payment(cls, payment_id: str) -> dict:
+        return await cls._request("GET", f"payments/{payment_id}")
+
+    @classmethod
+    async def list_payments(cls, params: dict) -> dict:
+        return await cls._request("GET", "payments", params=params)
@@ -0,0 +1,54 @@
+# web/metrics.py
+from aiohttp import web
+from config import settings
+from database.connection import get_pool_stats
+from services.blob_store import blob_store
+from services.cpu_pool import cpu_pool
+from services.job_scheduler import job_scheduler
+from services.payment_poller import payment_poller
+from services.result_cache import result_cache
+from utils.metrics import Counter, Gauge, registry
+from utils.logger import logger
+
+registry.register(Gauge(
+    "bot_jobs", "Image jobs in the scheduler", ("state",),
+    callback=lambda: {"running": job_scheduler.running, "queued": job_scheduler.queue_depth},
+))
+registry.register(Gauge(
+    "bot_cpu_pool_pending", "Tasks waiting for or running in the CPU pool",
+    callback=lambda: cpu_pool.pending,
+))
+registry.register(Gauge(
+    "bot_pending_invoices", "Invoices awaiting payment",
+    callback=lambda: payment_poller.pending_count,
+))
+registry.register(Gauge(
+    "bot_blob_store_bytes", "Image blob store size", ("tier",),
+    callback=lambda: {"memory": blob_store.stats()["memory_bytes"], "disk": blob_store.stats()["disk_bytes"]},
+))
+registry.register(Gauge(
+    "bot_db_pool_connections", "Database pool connections", ("state",),
+    callback=lambda: {"checked_out": get_pool_stats()["checked_out"], "checked_in": get_pool_stats()["checked_in"]},
+))
+registry.register(Counter(
+    "bot_result_cache_lookups_total", "Result cache lookups since start", ("result",),
+    callback=lambda: {"hit": result_cache.stats()["hits"], "miss": result_cache.stats()["misses"]},
+))
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=registry.render(), content_type="text/plain", headers={"X-Content-Type-Options": "nosniff"})
+
+
+def add_metrics_route(app: web.Application):
+    app.router.add_get(settings.metrics_path, handle_metrics)
+
+
+async def start_metrics_server() -> web.AppRunner:
+    app = web.Application()
+    add_metrics_route(app)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, settings.metrics_host, settings.metrics_port).start()
+    logger.info(f"Metrics listening on {settings.metrics_host}:{settings.metrics_port}{settings.metrics_path}")
+    return runner
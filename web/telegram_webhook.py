@@ -0,0 +1,229 @@
+# web/telegram_webhook.py
+import asyncio
+import json
+import secrets
+from typing import Optional
+import aiohttp
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from config import settings
+from web.yookassa_webhook import handle_notification, _is_trusted, _trusted_networks
+from web.metrics import add_metrics_route
+from utils.logger import logger
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def extract_user_id(update: dict) -> int:
+    """Update ichidan foydalanuvchi (yoki chat) id sini topadi; topilmasa 0"""
+    for key, value in update.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        user = value.get("from") or value.get("user")
+        if user:
+            return user["id"]
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+    return 0
+
+
+def worker_port(index: int) -> int:
+    return settings.telegram_webhook_worker_base_port + index
+
+
+async def start_app(app: web.Application, host: str, port: int) -> web.AppRunner:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def set_telegram_webhook(bot: Bot, allowed_updates: list[str]):
+    if not settings.telegram_webhook_url:
+        logger.warning("TELEGRAM_WEBHOOK_URL is not set, webhook must be registered manually")
+        return
+    url = f"{settings.telegram_webhook_url.rstrip('/')}{settings.telegram_webhook_path}"
+    await bot.set_webhook(
+        url=url,
+        secret_token=settings.telegram_webhook_secret or None,
+        allowed_updates=allowed_updates,
+        max_connections=settings.telegram_webhook_max_connections,
+        drop_pending_updates=True,
+    )
+    logger.info(f"Telegram webhook set to {url}")
+
+
+def create_telegram_app(bot: Bot, dp: Dispatcher, internal: bool = False) -> web.Application:
+    """Updateni qabul qilib darhol 200 qaytaradi, ishlov fon vazifasida davom etadi.
+
+    internal=True - front jarayon ortidagi worker ilovasi: loopback dan
+    keladigan YooKassa xabarlari ham shu yerda qabul qilinadi.
+    """
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=settings.telegram_webhook_secret or None,
+    ).register(app, path=settings.telegram_webhook_path)
+    if internal and settings.metrics_enabled:
+        # Har bir worker o'z metrikalarini loopback portida beradi
+        add_metrics_route(app)
+    if internal and settings.yookassa_webhook_enabled:
+        # IP tekshiruvi front jarayonda bajarilgan
+        app["trusted_networks"] = []
+        app["bot"] = bot
+        app.router.add_post(settings.yookassa_webhook_path, handle_notification)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+class UpdateForwarder:
+    """Front jarayon: updatelarni user_id bo'yicha doimiy worker ga uzatadi.
+
+    Bitta foydalanuvchining barcha updatelari (albom qismlari, to'lov
+    tugmalari) bitta jarayonga tushadi va har bir worker uchun alohida
+    navbat kelish tartibini saqlaydi.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._queues = [asyncio.Queue() for _ in range(workers)]
+        self._tasks: list[asyncio.Task] = []
+        self._session: aiohttp.ClientSession = None
+
+    @property
+    def _headers(self) -> dict:
+        headers = {"Content-Type": "application/json"}
+        if settings.telegram_webhook_secret:
+            headers[SECRET_HEADER] = settings.telegram_webhook_secret
+        return headers
+
+    def _url(self, index: int, path: str) -> str:
+        return f"http://127.0.0.1:{worker_port(index)}{path}"
+
+    async def start(self):
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.workers * 4),
+            timeout=aiohttp.ClientTimeout(total=10),
+        )
+        self._tasks = [asyncio.create_task(self._forward_loop(index)) for index in range(self.workers)]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._session is not None:
+            await self._session.close()
+
+    def route(self, body: bytes, user_id: int):
+        self._queues[user_id % self.workers].put_nowait(body)
+
+    async def _send(self, index: int, path: str, body: bytes) -> Optional[int]:
+        """Worker javob kodi; ulanib bo'lmasa None"""
+        try:
+            async with self._session.post(self._url(index, path), data=body, headers=self._headers) as response:
+                if response.status != 200:
+                    logger.warning(f"Worker {index} answered {response.status} for {path}")
+                return response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Worker {index} is unreachable: {e!r}")
+        return None
+
+    async def _post(self, index: int, path: str, body: bytes) -> bool:
+        return await self._send(index, path, body) == 200
+
+    async def _is_listening(self, index: int) -> bool:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", worker_port(index))
+        except OSError:
+            return False
+        writer.close()
+        return True
+
+    async def wait_ready(self, interval: float = 0.5):
+        """Worker port ochilganda uning startup hooklari (blob va invoice tiklash) tugagan bo'ladi"""
+        for index in range(self.workers):
+            attempts = 0
+            while not await self._is_listening(index):
+                attempts += 1
+                if attempts % 60 == 0:
+                    logger.warning(f"Still waiting for worker {index} to start ({attempts * interval:.0f}s)")
+                await asyncio.sleep(interval)
+        logger.info(f"All {self.workers} workers are listening")
+
+    async def _forward_loop(self, index: int):
+        queue = self._queues[index]
+        while True:
+            body = await queue.get()
+            # Telegramga 200 allaqachon qaytarilgan va update qayta yuborilmaydi:
+            # worker qayta ishga tushguncha kutiladi, faqat 4xx (buzilgan update) tashlanadi
+            attempt = 0
+            while True:
+                status = await self._send(index, settings.telegram_webhook_path, body)
+                if status == 200:
+                    break
+                if status is not None and 400 <= status < 500:
+                    logger.error(f"Dropped update for worker {index}: worker answered {status}")
+                    break
+                attempt += 1
+                await asyncio.sleep(min(0.5 * attempt, 5.0))
+
+    async def forward(self, path: str, body: bytes, user_id: int) -> bool:
+        return await self._post(user_id % self.workers, path, body)
+
+    async def broadcast(self, path: str, body: bytes) -> bool:
+        results = await asyncio.gather(*[self._post(index, path, body) for index in range(self.workers)])
+        return any(results)
+
+
+async def handle_front_update(request: web.Request) -> web.Response:
+    secret = settings.telegram_webhook_secret
+    if secret and not secrets.compare_digest(request.headers.get(SECRET_HEADER, ""), secret):
+        return web.Response(status=401)
+
+    body = await request.read()
+    try:
+        update = json.loads(body)
+    except ValueError:
+        return web.Response(status=400)
+
+    request.app["forwarder"].route(body, extract_user_id(update))
+    return web.Response(status=200)
+
+
+async def handle_front_yookassa(request: web.Request) -> web.Response:
+    if not _is_trusted(request.remote or "", request.app["trusted_networks"]):
+        logger.warning(f"YooKassa webhook from untrusted address {request.remote}")
+        return web.Response(status=403)
+
+    body = await request.read()
+    forwarder = request.app["forwarder"]
+    try:
+        metadata = (json.loads(body).get("object") or {}).get("metadata") or {}
+        telegram_id = int(metadata["telegram_id"])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        telegram_id = None
+
+    if telegram_id is not None:
+        # Invoice foydalanuvchi updatelari boradigan workerda yaratilgan; yetkazish ham faqat o'sha yerda
+        delivered = await forwarder.forward(settings.yookassa_webhook_path, body, telegram_id)
+    else:
+        delivered = await forwarder.broadcast(settings.yookassa_webhook_path, body)
+    return web.Response(status=200 if delivered else 503)
+
+
+def create_front_app(forwarder: UpdateForwarder) -> web.Application:
+    app = web.Application()
+    app["forwarder"] = forwarder
+    app.router.add_post(settings.telegram_webhook_path, handle_front_update)
+    return app
+
+
+def create_front_yookassa_app(forwarder: UpdateForwarder) -> web.Application:
+    app = web.Application()
+    app["forwarder"] = forwarder
+    app["trusted_networks"] = _trusted_networks()
+    app.router.add_post(settings.yookassa_webhook_path, handle_front_yookassa)
+    return app
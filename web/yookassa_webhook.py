@@ -0,0 +1,131 @@
+# web/yookassa_webhook.py
+import asyncio
+import ipaddress
+from functools import partial
+from typing import Optional
+from aiohttp import web
+from aiogram import Bot
+from config import settings
+from database.connection import get_async_session
+from database.models import User
+from handlers.payment_handler import recover_payment
+from repositories.payment_repository import PaymentRepository
+from services.payment_poller import payment_poller
+from services.payment_service import PaymentService
+from utils.logger import logger
+
+EVENT_STATUSES = {
+    "payment.succeeded": "succeeded",
+    "payment.canceled": "canceled",
+}
+
+
+def _trusted_networks() -> list:
+    return [
+        ipaddress.ip_network(network.strip(), strict=False)
+        for network in settings.yookassa_webhook_trusted_ips.split(",")
+        if network.strip()
+    ]
+
+
+def _is_trusted(remote: str, networks: list) -> bool:
+    if not networks:
+        return True
+    try:
+        address = ipaddress.ip_address(remote)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+def _parse_notification(body) -> Optional[tuple[Optional[str], Optional[str], Optional[int]]]:
+    """(holat, invoice_id, summa) yoki tuzilishi buzilgan bo'lsa None"""
+    if not isinstance(body, dict):
+        return None
+    event = body.get("event")
+    payment_object = body.get("object", {})
+    if not isinstance(event, (str, type(None))) or not isinstance(payment_object, dict):
+        return None
+    invoice_id = payment_object.get("id")
+    amount = payment_object.get("amount")
+    if not isinstance(invoice_id, (str, type(None))) or not isinstance(amount, (dict, type(None))):
+        return None
+    value = (amount or {}).get("value")
+    if value is not None:
+        try:
+            value = int(float(value))
+        except (TypeError, ValueError, OverflowError):
+            return None
+    return EVENT_STATUSES.get(event), invoice_id, value
+
+
+async def handle_notification(request: web.Request) -> web.Response:
+    if not _is_trusted(request.remote or "", request.app["trusted_networks"]):
+        logger.warning(f"YooKassa webhook from untrusted address {request.remote}")
+        return web.Response(status=403)
+
+    try:
+        body = await request.json()
+    except Exception:
+        return web.Response(status=400)
+
+    parsed = _parse_notification(body)
+    if parsed is None:
+        logger.warning(f"Malformed YooKassa webhook body from {request.remote}")
+        return web.Response(status=400)
+    status, invoice_id, amount = parsed
+    if status is None or not invoice_id:
+        # Boshqa hodisalar qabul qilinadi, lekin e'tiborsiz qoldiriladi
+        return web.Response(status=200)
+
+    async for session in get_async_session():
+        payment_repo = PaymentRepository(session)
+        payment = await payment_repo.get_by_invoice_id(invoice_id)
+        if payment is None:
+            logger.warning(f"YooKassa webhook for unknown invoice {invoice_id}")
+            return web.Response(status=200)
+
+        if status == "succeeded" and amount is not None and amount != payment.amount:
+            # 200: aks holda YooKassa xabarni 24 soat davomida qayta yuboradi
+            logger.error(f"YooKassa webhook amount mismatch for {invoice_id}: {amount} != {payment.amount}")
+            return web.Response(status=200)
+
+        if settings.yookassa_webhook_verify:
+            # Xabardagi holat API orqali tasdiqlanadi
+            status = await PaymentService.fetch_status(invoice_id)
+            if status not in ("succeeded", "canceled"):
+                return web.Response(status=200)
+
+        if payment.status != status:
+            await payment_repo.update_status(invoice_id, status)
+        user = await session.get(User, payment.user_id)
+
+    logger.info(f"YooKassa webhook: invoice {invoice_id} -> {status}")
+    resolved = await payment_poller.resolve(invoice_id, status)
+    bot = request.app.get("bot")
+    if not resolved and status == "succeeded" and bot is not None and user is not None:
+        # Invoice bu jarayonda kutilmayapti (lokal muddat, restart): to'lov baribir yetkaziladi
+        asyncio.create_task(payment_poller.run_callback(
+            invoice_id, partial(recover_payment, bot, user.telegram_id, invoice_id)
+        ))
+    return web.Response(status=200)
+
+
+def create_yookassa_app(bot: Optional[Bot] = None) -> web.Application:
+    app = web.Application()
+    app["trusted_networks"] = _trusted_networks()
+    app["bot"] = bot
+    app.router.add_post(settings.yookassa_webhook_path, handle_notification)
+    return app
+
+
+async def start_yookassa_webhook(bot: Optional[Bot] = None) -> web.AppRunner:
+    runner = web.AppRunner(create_yookassa_app(bot))
+    await runner.setup()
+    site = web.TCPSite(runner, settings.yookassa_webhook_host, settings.yookassa_webhook_port)
+    await site.start()
+    logger.info(
+        f"YooKassa webhook listening on {settings.yookassa_webhook_host}:"
+        f"{settings.yookassa_webhook_port}{settings.yookassa_webhook_path}"
+    )
+    return runner